@@ -0,0 +1,82 @@
+"""
+Measures how long a fresh process takes to import the app and to serve its first request, which is what every
+worker restart (or every worker, without preload_app) pays before it can take traffic.
+
+    python benchmarks/boot.py --repeat 10
+    python benchmarks/boot.py --imports 15
+
+--imports lists the slowest top-level imports of one boot, as reported by `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT = '''
+import json, time
+started = time.perf_counter()
+from gifted import app
+imported = time.perf_counter()
+app.test_client().get('https://localhost/login')
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (served - started) * 1000}))
+'''
+
+
+def environment():
+    env = dict(os.environ)
+    for key, value in [('FLASK_KEY', 'benchmark'), ('FLASK_MAIL_USER', 'benchmark'), ('FLASK_MAIL_PASSWORD', ''),
+                       ('FLASK_LOG_TO_STDOUT', '1'), ('BLOB_STORE_BACKEND', 'memory')]:
+        env.setdefault(key, value)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'boot.sqlite')
+    env['PYTHONPATH'] = ROOT
+    return env
+
+
+def boot(env):
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', BOOT], env=env, cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, count):
+    """Returns [(cumulative ms, module)] for the modules imported directly by gifted or the interpreter."""
+    stderr = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import gifted'], env=env,
+                            cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # two spaces of indentation per nesting level; keep the first two levels
+        if len(name) - len(name.lstrip()) <= 3:
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=0, metavar='N', help='Also list the N slowest imports.')
+    args = parser.parse_args()
+
+    env = environment()
+    boot(env)  # warm the filesystem and bytecode caches
+    runs = [boot(env) for _ in range(args.repeat)]
+    for key in ['import_ms', 'first_request_ms']:
+        values = sorted(run[key] for run in runs)
+        print(f'{key:<18} median {values[len(values) // 2]:>8.1f}  min {values[0]:>8.1f}  max {values[-1]:>8.1f}')
+
+    if args.imports:
+        print()
+        for ms, name in slowest_imports(env, args.imports):
+            print(f'{ms:>8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Races many participants for the same items through the real claim and unclaim routes, one thread and one login
+session per participant, against a file-backed SQLite database. Every item must end up claimed exactly once, every
+losing request must get the "already claimed" answer rather than an error, and the wishlist summaries must still
+match a recomputation from scratch.
+
+    python benchmarks/claims.py --threads 24 --items 10
+
+Exits with status 1 if any of that does not hold.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import generate  # noqa: E402  (also prepares the environment the app needs)
+
+BASE_URL = 'https://localhost'
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
+
+
+def outcome(client, response, success):
+    """Sorts a response into 'won', 'lost' or 'error'."""
+    if response.status_code != 302:
+        return 'error'
+    messages = flashes(client)
+    if any(message.startswith(success) for message in messages):
+        return 'won'
+    return 'lost' if messages else 'error'
+
+
+def race(clients, task):
+    """Runs task(client) on every client at the same moment and returns the results."""
+    barrier = threading.Barrier(len(clients))
+
+    def contend(client):
+        barrier.wait()
+        return task(client)
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        return list(pool.map(contend, clients))
+
+
+def run(args):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'claims.sqlite')
+    dataset = generate(events=1, participants=args.threads + 1, items=args.items * 2, claim_rate=0, child_rate=0,
+                       image_rate=0, invites=0, seed=args.seed)
+
+    from gifted import app, db
+    from gifted.models import Item, Transaction, User, WishlistSummary
+
+    app.extensions['mail'].suppress = True
+    event_id = dataset['events'][0]
+    with app.app_context():
+        admin = User.query.filter_by(username=dataset['admin']).first()
+        owner_id = admin.id
+        item_ids = [row.id for row in db.session.query(Item.id).filter_by(event_id=event_id, user_id=owner_id)
+                    .order_by(Item.id).limit(args.items)]
+        gifters = [user.username for user in User.query.filter(User.id != owner_id).order_by(User.id)]
+        db.session.remove()
+
+    clients = []
+    for username in gifters[:args.threads]:
+        client = app.test_client()
+        client.post(BASE_URL + '/login', data={'username': username, 'password': dataset['password']})
+        flashes(client)
+        clients.append(client)
+    wishlist = f'{BASE_URL}/events/{event_id}/wishlists/{owner_id}'
+
+    failures = []
+    claims = Counter()
+    for item_id in item_ids:
+        results = race(clients, lambda client: outcome(
+            client, client.post(f'{wishlist}/transactions', data={'item_id': item_id}), 'You claimed'))
+        claims.update(results)
+        if results.count('won') != 1 or 'error' in results:
+            failures.append(f'item {item_id}: {Counter(results)}')
+
+    with app.app_context():
+        rows = db.session.query(Transaction.id, Transaction.item_id).filter(Transaction.item_id.in_(item_ids)).all()
+        stored = Counter(row.item_id for row in rows)
+        transaction_ids = [row.id for row in rows]
+        db.session.remove()
+    for item_id in item_ids:
+        if stored[item_id] != 1:
+            failures.append(f'item {item_id} has {stored[item_id]} transactions')
+
+    # everyone now tries to unclaim every item at once; only the gifter who holds each claim may succeed
+    unclaims = Counter()
+    for transaction_id in transaction_ids:
+        results = race(clients, lambda client: outcome(
+            client, client.post(f'{wishlist}/transactions/{transaction_id}/delete'), 'You unclaimed'))
+        unclaims.update(results)
+        if results.count('won') != 1 or 'error' in results:
+            failures.append(f'transaction {transaction_id}: {Counter(results)}')
+
+    with app.app_context():
+        remaining = db.session.query(Transaction.id).filter(Transaction.item_id.in_(item_ids)).count()
+        drift = WishlistSummary.verify(event_id)
+        db.session.remove()
+    if remaining:
+        failures.append(f'{remaining} transactions survived unclaiming')
+    for mismatch in drift:
+        failures.append('summary drift: event %r user %r %s is %r, expected %r' % mismatch)
+
+    print(f'{len(clients)} threads raced for {len(item_ids)} items')
+    print(f'claims    won {claims["won"]:>5}  lost {claims["lost"]:>5}  errors {claims["error"]:>5}')
+    print(f'unclaims  won {unclaims["won"]:>5}  lost {unclaims["lost"]:>5}  errors {unclaims["error"]:>5}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='Participants claiming at the same time.')
+    parser.add_argument('--items', type=int, default=10, help='Items they all race for, one after another.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failures = run(args)
+    for failure in failures:
+        print(f'FAILED: {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Builds a realistic, reproducible dataset through the real models: events with participants (some of them children),
+wishlists with thumbnails, claims, pairs and outstanding invites. The same seed always produces the same data.
+
+    python benchmarks/datagen.py --database /tmp/gifted-bench.sqlite --events 5 --participants 40 --items 12 --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# importing the package builds the app, which needs these even though nothing here sends mail
+for key, value in [('FLASK_KEY', 'benchmark'), ('FLASK_MAIL_USER', 'benchmark'), ('FLASK_MAIL_PASSWORD', ''),
+                   ('FLASK_LOG_TO_STDOUT', '1'), ('BLOB_STORE_BACKEND', 'memory')]:
+    os.environ.setdefault(key, value)
+
+PASSWORD = 'benchmark'
+PRIORITIES = ['low', 'medium', 'high', None]
+THINGS = ['socks', 'board game', 'headphones', 'novel', 'sweater', 'mug', 'puzzle', 'candle', 'scarf', 'lego set',
+          'coffee beans', 'notebook', 'slippers', 'speaker', 'cookbook', 'backpack']
+
+
+def thumbnail(rng):
+    from PIL import Image
+
+    image = Image.new('RGB', (250, 250), tuple(rng.randrange(256) for _ in range(3)))
+    b = BytesIO()
+    image.save(b, format='PNG')
+    return b.getvalue()
+
+
+def generate(events=3, participants=30, items=10, claim_rate=0.3, child_rate=0.1, image_rate=0.5, invites=5,
+             seed=0):
+    """
+    Fills the configured database and returns {'admin': username, 'password': ..., 'events': [event ids]}.
+    The first user of every event administers it and is a site admin, so every route is reachable as them.
+    """
+    from werkzeug import security
+
+    from gifted import app, db, blob_store
+    from gifted.models import User, Event, Item, Transaction, Invite, SiteAdmin, WishlistSummary
+
+    rng = random.Random(seed)
+    # hashing is deliberately slow, and every benchmark user shares the same password anyway
+    password = security.generate_password_hash(PASSWORD)
+    now = datetime(2020, 12, 1)
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin@bench', password=password, first_name='Ada', last_name='Admin')
+        db.session.add(admin)
+        db.session.flush()
+        db.session.add(SiteAdmin(user_id=admin.id))
+
+        event_ids = []
+        for e in range(events):
+            starts_on = now - timedelta(days=365 * (events - e - 1))
+            event = Event(title=f'Christmas {starts_on.year}', description='Synthetic benchmark event',
+                          starts_on=starts_on, ends_on=starts_on + timedelta(days=30))
+            db.session.add(event)
+
+            members = [admin]
+            for p in range(participants - 1):
+                parent = rng.choice(members) if len(members) > 1 and rng.random() < child_rate else None
+                user = User(username=f'e{e}p{p}@bench', password=password, first_name=f'Person{p}',
+                            last_name=f'Family{e}', parent_id=parent.id if parent else None,
+                            registrar_id=admin.id)
+                db.session.add(user)
+                db.session.flush()
+                members.append(user)
+            db.session.flush()
+            event.add_members(members)
+            event.add_members([admin], as_admin=True)
+
+            for member in members:
+                for i in range(rng.randint(items // 2, items * 3 // 2)):
+                    item = Item(event_id=event.id, user_id=member.id, description=rng.choice(THINGS),
+                                price=round(rng.uniform(5, 150), 2), priority=rng.choice(PRIORITIES),
+                                notes='please!' if rng.random() < 0.2 else None,
+                                location=f'https://shop.example.com/{e}/{member.id}/{i}')
+                    if rng.random() < image_rate:
+                        item.image_hash = blob_store.put(thumbnail(rng))
+                        item.image_status = 'ready'
+                    db.session.add(item)
+                    db.session.flush()
+                    if rng.random() < claim_rate:
+                        gifter = rng.choice([m for m in members if m.id != member.id])
+                        db.session.add(Transaction(event_id=event.id, item_id=item.id, gifter_id=gifter.id,
+                                                   giftee_id=member.id, transacted_on=now))
+
+            for i in range(invites):
+                db.session.add(Invite(event_id=event.id, invited_by=admin.id, email=f'e{e}i{i}@bench',
+                                      code=f'code{e}{i}', created_on=now, expires_on=now + timedelta(days=7)))
+            db.session.commit()
+            event.matchmake([member.id for member in members], rng=rng)
+            event_ids.append(event.id)
+
+        WishlistSummary.rebuild()
+        return {'admin': admin.username, 'password': PASSWORD, 'events': event_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file to create (it must not exist yet).')
+    parser.add_argument('--events', type=int, default=3)
+    parser.add_argument('--participants', type=int, default=30)
+    parser.add_argument('--items', type=int, default=10, help='Average wishlist length.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f'{args.database} already exists')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.database)
+    dataset = generate(events=args.events, participants=args.participants, items=args.items, seed=args.seed)
+    print(f'Generated {len(dataset["events"])} events; log in as {dataset["admin"]} / {dataset["password"]}')
+
+
+if __name__ == '__main__':
+    main()
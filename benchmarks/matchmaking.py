@@ -0,0 +1,60 @@
+"""
+Times the matchmaking engine on synthetic participants with households, last year's pairs and explicit exclusions.
+
+    python benchmarks/matchmaking.py --sizes 100 1000 10000 --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# importing the package builds the app, which needs these even though the engine never touches them
+for key, value in [('FLASK_KEY', 'benchmark'), ('FLASK_MAIL_USER', 'benchmark'), ('FLASK_MAIL_PASSWORD', ''),
+                   ('DATABASE_URL', 'sqlite://'), ('FLASK_LOG_TO_STDOUT', '1')]:
+    os.environ.setdefault(key, value)
+
+from gifted.matchmaking import matchmake  # noqa: E402
+
+
+def synthesize(n, rng):
+    participants = list(range(n))
+    households = {}
+    household = 0
+    for participant in participants:
+        # households of one to four people
+        if rng.random() < 0.4:
+            household = participant
+        households[participant] = household
+    shuffled = participants[:]
+    rng.shuffle(shuffled)
+    history = {shuffled[i]: shuffled[(i + 1) % n] for i in range(n)}
+    exclusions = [(rng.randrange(n), rng.randrange(n)) for _ in range(n // 20)]
+    exclusions = [(a, b) for a, b in exclusions if a != b]
+    return participants, households, history, exclusions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"participants":>12} {"best ms":>10} {"mean ms":>10} {"relaxed":>10}')
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        participants, households, history, exclusions = synthesize(n, rng)
+        timings = []
+        dropped = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            pairs, dropped = matchmake(participants, exclusions, households, history, rng)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert sorted(pairs) == sorted(pairs.values()) == participants
+        print(f'{n:>12} {min(timings):>10.2f} {sum(timings) / len(timings):>10.2f} {",".join(dropped) or "-":>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Drives the main pages through the Flask test client against a generated dataset and reports p50/p95 latency and the
+number of SQL statements per route. Save a baseline before a change and compare against it afterwards:
+
+    python benchmarks/routes.py --save benchmarks/baseline.json
+    python benchmarks/routes.py --compare benchmarks/baseline.json
+
+Comparison fails (exit status 1) when a route runs more queries than its baseline, or when its p95 grows by more
+than --tolerance. Query counts are exact, timings depend on the machine, so keep baselines from the same host.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import generate  # noqa: E402  (also prepares the environment the app needs)
+
+BASE_URL = 'https://localhost'
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Recorder(object):
+    """Counts the statements each request sends to the database."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.record)
+
+    def record(self, *args):
+        self.count += 1
+
+
+def scenarios(dataset):
+    """Returns [(name, method, url, form data or a callable that builds fresh form data for each request)]."""
+    from gifted import db
+    from gifted.models import Item, Transaction, event_user
+
+    event_id = dataset['events'][-1]
+    admin_id = dataset['admin_id']
+    members = [row.user_id for row in db.session.query(event_user.c.user_id)
+               .filter(event_user.c.event_id == event_id)]
+    other = next(member for member in members if member != admin_id)
+
+    # a supply of items nobody has claimed yet, so every claim_item request does real work
+    unclaimed = iter([row.id for row in db.session.query(Item.id)
+                      .outerjoin(Transaction, Transaction.item_id == Item.id)
+                      .filter(Item.event_id == event_id, Item.user_id != admin_id, Transaction.id.is_(None))])
+    owners = dict(db.session.query(Item.id, Item.user_id).filter(Item.event_id == event_id))
+    db.session.remove()
+
+    def claim():
+        item_id = next(unclaimed)
+        return {'item_id': item_id, 'gifter_id': admin_id, 'giftee_id': owners[item_id]}
+
+    return [
+        ('index', 'get', '/', None),
+        ('event', 'get', f'/events/{event_id}', None),
+        ('wishlist', 'get', f'/events/{event_id}/wishlists/{other}', None),
+        ('purchases', 'get', f'/events/{event_id}/purchases/{admin_id}', None),
+        ('claim_item', 'post', f'/events/{event_id}/wishlists/{other}/transactions', claim),
+        ('matchmake', 'post', f'/admin/events/{event_id}/matchmake', {'shuffledUsers': [str(m) for m in members]}),
+        ('manage_event', 'get', f'/admin/events/{event_id}', None),
+    ]
+
+
+def run(args):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.sqlite')
+    dataset = generate(events=args.events, participants=args.participants, items=args.items, seed=args.seed)
+
+    from gifted import app, db
+    from gifted.models import User
+
+    app.extensions['mail'].suppress = True
+    with app.app_context():
+        dataset['admin_id'] = User.query.filter_by(username=dataset['admin']).first().id
+        routes = scenarios(dataset)
+        recorder = Recorder(db.engine)
+
+    client = app.test_client()
+    client.post(BASE_URL + '/login', data={'username': dataset['admin'], 'password': dataset['password']})
+
+    results = {}
+    for name, method, url, data in routes:
+        timings, queries = [], []
+        for i in range(args.warmup + args.repeat):
+            form = data() if callable(data) else data
+            recorder.count = 0
+            start = time.perf_counter()
+            response = getattr(client, method)(BASE_URL + url, data=form)
+            elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code >= 400:
+                raise SystemExit(f'{name} returned {response.status_code}')
+            if i >= args.warmup:
+                timings.append(elapsed)
+                queries.append(recorder.count)
+        results[name] = {'p50_ms': round(percentile(timings, 50), 2), 'p95_ms': round(percentile(timings, 95), 2),
+                         'queries': max(queries)}
+    return results
+
+
+def report(results, baseline=None):
+    print(f'{"route":<14} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}' + (f' {"base p95":>9} {"base q":>7}'
+                                                                        if baseline else ''))
+    for name, result in results.items():
+        line = f'{name:<14} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["queries"]:>8}'
+        if baseline and name in baseline:
+            line += f' {baseline[name]["p95_ms"]:>9.2f} {baseline[name]["queries"]:>7}'
+        print(line)
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if result['queries'] > baseline[name]['queries']:
+            found.append(f'{name} runs {result["queries"]} queries, baseline {baseline[name]["queries"]}')
+        if result['p95_ms'] > baseline[name]['p95_ms'] * (1 + tolerance):
+            found.append(f'{name} p95 is {result["p95_ms"]:.2f}ms, baseline {baseline[name]["p95_ms"]:.2f}ms')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=3)
+    parser.add_argument('--participants', type=int, default=30)
+    parser.add_argument('--items', type=int, default=10, help='Average wishlist length.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--save', metavar='PATH', help='Write the results as a baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare the results against a saved baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='Allowed relative p95 growth before a route counts as a regression.')
+    args = parser.parse_args()
+
+    dataset = {'events': args.events, 'participants': args.participants, 'items': args.items, 'seed': args.seed}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        if saved['dataset'] != dataset:
+            parser.error(f'{args.compare} was recorded with a different dataset: {saved["dataset"]}')
+        baseline = saved['routes']
+
+    results = run(args)
+    report(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'dataset': dataset, 'routes': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if baseline is not None:
+        found = regressions(results, baseline, args.tolerance)
+        for regression in found:
+            print(f'REGRESSION: {regression}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
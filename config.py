@@ -9,9 +9,57 @@ class Config(object):
         'sqlite:///' + os.path.join(basedir, 'gifted.sqlite')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     LOG_TO_STDOUT = os.environ.get('FLASK_LOG_TO_STDOUT')
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 465
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK') or 'warn'
+    LOG_SINKS = os.environ.get('LOG_SINKS') or ('stdout' if LOG_TO_STDOUT else 'file')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT') or 'json'
+    LOG_FILE = os.environ.get('LOG_FILE') or os.path.join('logs', 'gifted-{pid}.log')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES') or 10 * 1024 * 1024)
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT') or 10)
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+    LOG_REQUESTS = (os.environ.get('LOG_REQUESTS') or 'false').lower() == 'true'
+    SESSION_IDENTITY_SNAPSHOT = os.environ.get('SESSION_IDENTITY_SNAPSHOT')
+    SESSION_IDENTITY_TTL = int(os.environ.get('SESSION_IDENTITY_TTL') or 300)
+    SESSION_AUTHZ_CACHE = (os.environ.get('SESSION_AUTHZ_CACHE') or 'true').lower() == 'true'
+    # for a local debugging SMTP server set MAIL_SERVER/MAIL_PORT, MAIL_USE_SSL=false and an empty FLASK_MAIL_PASSWORD
+    MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 465)
     MAIL_USERNAME = os.environ['FLASK_MAIL_USER']
     MAIL_PASSWORD = os.environ['FLASK_MAIL_PASSWORD']
     MAIL_USE_TLS = False
-    MAIL_USE_SSL = True
+    MAIL_USE_SSL = (os.environ.get('MAIL_USE_SSL') or 'true').lower() == 'true'
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE') or 50)
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS') or 5)
+    MAIL_OUTBOX_BACKOFF = int(os.environ.get('MAIL_OUTBOX_BACKOFF') or 30)
+    MAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL') or 60)
+    IMAGE_INGEST_BACKEND = os.environ.get('IMAGE_INGEST_BACKEND') or 'thread'
+    IMAGE_INGEST_WORKERS = int(os.environ.get('IMAGE_INGEST_WORKERS') or 4)
+    IMAGE_INGEST_RETRIES = int(os.environ.get('IMAGE_INGEST_RETRIES') or 3)
+    IMAGE_INGEST_BACKOFF = float(os.environ.get('IMAGE_INGEST_BACKOFF') or 1.0)
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT') or 3.05)
+    HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT') or 10)
+    HTTP_TOTAL_TIMEOUT = float(os.environ.get('HTTP_TOTAL_TIMEOUT') or 20)
+    HTTP_MAX_HTML_BYTES = int(os.environ.get('HTTP_MAX_HTML_BYTES') or 512 * 1024)
+    HTTP_MAX_IMAGE_BYTES = int(os.environ.get('HTTP_MAX_IMAGE_BYTES') or 5 * 1024 * 1024)
+    HTTP_MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST') or 2)
+    HTTP_MAX_IN_FLIGHT = int(os.environ.get('HTTP_MAX_IN_FLIGHT') or 8)
+    HTTP_MAX_HOSTS = int(os.environ.get('HTTP_MAX_HOSTS') or 256)
+    METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE') or 1024)
+    METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL') or 7 * 24 * 60 * 60)
+    METADATA_CACHE_NEGATIVE_TTL = int(os.environ.get('METADATA_CACHE_NEGATIVE_TTL') or 60 * 60)
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND') or 'memory'
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 256)
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL') or 60 * 60)
+    FRAGMENT_CACHE_PATH = os.environ.get('FRAGMENT_CACHE_PATH') or os.path.join(basedir, 'fragments')
+    INSTRUMENTATION = (os.environ.get('INSTRUMENTATION') or 'false').lower() == 'true'
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 500)
+    SLOW_REQUEST_STATEMENTS = int(os.environ.get('SLOW_REQUEST_STATEMENTS') or 5)
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 10)
+    METRICS_BACKEND = os.environ.get('METRICS_BACKEND') or 'memory'
+    METRICS_PATH = os.environ.get('METRICS_PATH') or os.path.join(basedir, 'metrics')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS') or '127.0.0.1,::1'
+    BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND') or 'filesystem'
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH') or os.path.join(basedir, 'blobs')
+    # a dyno's filesystem is wiped on every restart, so the item table keeps its copy unless the path is known to last
+    BLOB_STORE_DURABLE = (os.environ.get('BLOB_STORE_DURABLE') or 'false').lower() == 'true'
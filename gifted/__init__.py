@@ -1,48 +1,57 @@
-import logging
 import os
 from datetime import date
-from logging.handlers import RotatingFileHandler
 
 from flask import Flask
 from flask_mail import Mail
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_talisman import Talisman
 
 from config import Config
+from gifted.blobstore import create_blob_store
+from gifted.fragments import create_fragment_cache
 from gifted.helpers import validate, login_required
+from gifted.httpclient import create_http_client
+from gifted.identity import LazyGlobals
+from gifted.ingest import create_ingestor
+from gifted.instrumentation import create_instrumentation
+from gifted.logpipeline import create_log_pipeline
+from gifted.metacache import create_metadata_cache
+from gifted.outbox import create_mail_sender
+from gifted.prometheus import create_metrics
 
 app = Flask(__name__)
+app.app_ctx_globals_class = LazyGlobals
 app.url_map.strict_slashes = False
 app.config.from_object(Config)
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = None
+if os.environ.get('FLASK_RUN_FROM_CLI'):
+    # only the flask command needs `flask db`, and alembic is slow to import, so web workers skip it
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db, render_as_batch=True)
 mail = Mail(app)
 app.extensions['mail'].debug = 0
+mail_sender = create_mail_sender(app, mail)
+app.before_first_request(mail_sender.start)
 Talisman(app, content_security_policy=None)
-
-from gifted import models, errors
+http_client = create_http_client(app)
+blob_store = create_blob_store(app)
+fragment_cache = create_fragment_cache(app)
+metadata_cache = create_metadata_cache(app)
+image_ingestor = create_ingestor(app, blob_store, metadata_cache)
+request_instrumentation = create_instrumentation(app, db, http_client)
+metrics = create_metrics(app, db)
+
+from gifted import models, errors, commands
 from .admin.routes import admin
+from .api.routes import api
 from .main.routes import main
 
 app.register_blueprint(admin)
+app.register_blueprint(api)
 app.register_blueprint(main)
 
-if app.config['LOG_TO_STDOUT']:
-    del app.logger.handlers[:]
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s: %(message)s'))
-    stream_handler.setLevel(logging.INFO)
-    app.logger.addHandler(stream_handler)
-else:
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    file_handler = RotatingFileHandler('logs/gifted.log', maxBytes=10240, backupCount=10)
-    file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-
-app.logger.setLevel(logging.INFO)
+log_pipeline = create_log_pipeline(app)
 app.logger.info('Gifted startup')
 
 
@@ -51,11 +60,6 @@ def template_function(func):
     return func
 
 
-@template_function
-def child_check(event_children, my_children):
-    return any(child in event_children for child in my_children)
-
-
 @template_function
 def pretty_date(d):
     return d.strftime('%x') if isinstance(d, date) else d
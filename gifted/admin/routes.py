@@ -8,33 +8,75 @@ from werkzeug import security
 from werkzeug.exceptions import abort
 from werkzeug.utils import redirect
 
-from gifted import db, mail, app
-from gifted.helpers import generate_code, login_required
-from gifted.models import Invite, Event, User, SiteAdmin
+from gifted import db, app, mail_sender, outbox
+from gifted.authz import can_manage, event_admin_required, is_site_admin
+from gifted.helpers import generate_code, login_required, parse_emails
+from gifted.matchmaking import MatchmakingError
+from gifted.models import Invite, Event, User, PairExclusion, event_admin
 
 admin = Blueprint('admin', __name__,
                   template_folder='templates',
                   static_folder='static')
 
+EVENT_PAGE_SIZE = 25
+EVENT_FILTERS = ['all', 'active', 'expired', 'mine']
+# what each soft matchmaking constraint asks for; explicit exclusions are never relaxed
+SOFT_CONSTRAINTS = {
+    'history': "avoid last time's pairs",
+    'households': 'keep households apart',
+}
+
 
 @admin.route('/admin/events')
 @login_required
 def index():
-    if SiteAdmin.contains(g.user.id):
-        events = Event.query.all()
-    else:
-        events = g.user.administration
-    return render_template('admin.html', events=events)
+    status = request.args.get('status') if request.args.get('status') in EVENT_FILTERS else 'all'
+    site_admin = is_site_admin()
+    query = Event.query
+    if not site_admin or status == 'mine':
+        query = query.join(event_admin, event_admin.c.event_id == Event.id).filter(event_admin.c.user_id == g.user.id)
+    now = datetime.now()
+    if status == 'active':
+        query = query.filter(Event.starts_on <= now, Event.ends_on >= now)
+    elif status == 'expired':
+        query = query.filter(Event.ends_on < now)
+
+    # keyset pagination on (starts_on, id), newest first and events without a start date last; the cursor is the last
+    # row of the previous page, with an empty start date for an undated event
+    cursor = parse_event_cursor(request.args.get('cursor'))
+    if cursor is not None:
+        starts_on, event_id = cursor
+        if starts_on is None:
+            query = query.filter(Event.starts_on.is_(None), Event.id < event_id)
+        else:
+            query = query.filter(db.or_(Event.starts_on.is_(None), Event.starts_on < starts_on,
+                                        db.and_(Event.starts_on == starts_on, Event.id < event_id)))
+    events = query.order_by(Event.starts_on.is_(None), Event.starts_on.desc(), Event.id.desc()) \
+        .limit(EVENT_PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(events) > EVENT_PAGE_SIZE:
+        events = events[:EVENT_PAGE_SIZE]
+        last = events[-1]
+        next_cursor = f'{last.starts_on.isoformat() if last.starts_on else ""},{last.id}'
+
+    return render_template('admin.html', events=events, counts=Event.get_counts([event.id for event in events]),
+                           status=status, filters=EVENT_FILTERS if site_admin else EVENT_FILTERS[:-1],
+                           next_cursor=next_cursor)
+
+
+def parse_event_cursor(cursor):
+    try:
+        starts_on, event_id = cursor.split(',')
+        return datetime.fromisoformat(starts_on) if starts_on else None, int(event_id)
+    except (AttributeError, ValueError):
+        return None
 
 
 @admin.route('/admin/events/<event_id>')
 @login_required
+@event_admin_required
 def manage_event(event_id):
     event = Event.query.get(event_id)
-    if event is None:
-        abort(404)
-    if g.user not in event.admins and SiteAdmin.contains(g.user.id) is False:
-        abort(401)
 
     existing_ids = []
     for user in event.users:
@@ -71,18 +113,68 @@ def create_event():
 
 @admin.route('/admin/events/<event_id>/matchmake', methods=['POST'])
 @login_required
+@event_admin_required
 def matchmake(event_id):
     users_to_shuffle = request.form.getlist('shuffledUsers')
     if len(users_to_shuffle) < 2:
         flash('A minimum of two are required to shuffle!', 'warning')
         return redirect(url_for('admin.manage_event', event_id=event_id))
     event = Event.query.get(event_id)
-    event.matchmake(users_to_shuffle)
-    flash('Shuffled users!', 'success')
+    try:
+        dropped = event.matchmake(users_to_shuffle)
+    except MatchmakingError as e:
+        flash(f'Could not shuffle users: {e}!', 'warning')
+        return redirect(url_for('admin.manage_event', event_id=event_id))
+
+    if dropped:
+        relaxed = ' or '.join(SOFT_CONSTRAINTS[name] for name in dropped)
+        flash(f'Shuffled users, but could not {relaxed}! Exclusions were still honoured.', 'warning')
+    else:
+        flash('Shuffled users!', 'success')
     app.logger.info(f'{g.user.username} shuffled {event}')
     return redirect(url_for('admin.manage_event', event_id=event_id))
 
 
+@admin.route('/admin/events/<event_id>/exclusions', methods=['POST'])
+@login_required
+@event_admin_required
+def add_exclusion(event_id):
+    user_id = request.form.get('userId')
+    excluded_user_id = request.form.get('excludedUserId')
+    if user_id == excluded_user_id:
+        flash('Pick two different people!', 'warning')
+        return redirect(url_for('admin.manage_event', event_id=event_id))
+
+    exclusion = PairExclusion(event_id=event_id, user_id=user_id, excluded_user_id=excluded_user_id)
+    db.session.add(exclusion)
+    db.session.commit()
+    flash(f'{exclusion.user.get_full_name()} and {exclusion.excluded_user.get_full_name()} will not be paired!',
+          'success')
+    app.logger.info(f'{g.user.username} added {exclusion}')
+    return redirect(url_for('admin.manage_event', event_id=event_id))
+
+
+@admin.route('/admin/exclusions/<exclusion_id>/delete', methods=['POST'])
+@login_required
+def remove_exclusion(exclusion_id):
+    exclusion = PairExclusion.query.get(exclusion_id)
+    if exclusion is None:
+        abort(404)
+    event_id = exclusion.event_id
+    # an exclusion without an event applies to every event, so only site admins may lift it
+    event = Event.query.get(event_id) if event_id is not None else None
+    if not (can_manage(event) if event is not None else is_site_admin()):
+        abort(401)
+
+    db.session.delete(exclusion)
+    db.session.commit()
+    flash('Removed the pairing exclusion!', 'success')
+    app.logger.info(f'{g.user.username} removed {exclusion}')
+    if event_id is None:
+        return redirect(url_for('admin.index'))
+    return redirect(url_for('admin.manage_event', event_id=event_id))
+
+
 @admin.route('/admin/events/<event_id>/delete', methods=['POST'])
 @login_required
 def delete_event(event_id):
@@ -98,21 +190,16 @@ def delete_event(event_id):
 @login_required
 def add_users(event_id):
     event = Event.query.get(event_id)
-    users = request.form.getlist('users')
+    user_ids = [int(user_id) for user_id in request.form.getlist('users')]
     is_admin_add = request.form.get('isAdminAdd')
-    usernames = []
-    for user_id in users:
-        user = User.query.get(user_id)
-        event.users.append(user)
-        if is_admin_add:
-            event.admins.append(user)
-        if user.parent:
-            event.children.append(user)
-        db.session.commit()
-        app.logger.info(f'{g.user.username} added {user} to {event}')
-        usernames.append(user.username)
+    users = User.query.filter(User.id.in_(user_ids)).all() if user_ids else []
+    added = event.add_members(users, as_admin=bool(is_admin_add))
+    db.session.commit()
 
-    username_list = ', '.join(usernames)
+    usernames = [user.username for user in added]
+    if usernames:
+        app.logger.info(f'{g.user.username} added {", ".join(usernames)} to {event}')
+    username_list = ', '.join(usernames) or 'nobody new'
     flash(f'Added {username_list} to {event.title}!', 'success')
     return redirect(url_for('admin.manage_event', event_id=event_id))
 
@@ -134,6 +221,7 @@ def add_user_child():
 
     event.users.append(child)
     event.children.append(child)
+    Event.bump_generation(event.id)
     db.session.add(child)
     db.session.commit()
     flash(f'Successfully added {child.get_full_name()} as a child of { child.parent.get_full_name()}!', 'success')
@@ -148,9 +236,7 @@ def remove_user():
     user_id = request.form.get('userId')
     event = Event.query.get(event_id)
     user = User.query.get(user_id)
-    if user.parent_id:
-        event.children.remove(user)
-    event.users.remove(user)
+    event.remove_member(user.id)
     db.session.commit()
     flash(f'Removed {user.get_full_name()} from {event.title}!', 'success')
     app.logger.info(f'{g.user.username} removed {user} from {event}')
@@ -162,6 +248,7 @@ def remove_user():
 def delete_user(user_id):
     user = User.query.get(user_id)
     copy = deepcopy(user)
+    Event.bump_generation(*[event.id for event in user.events])
     db.session.delete(user)
     db.session.commit()
     flash(f'Deleted {copy.username}\'s account!', 'success')
@@ -191,15 +278,87 @@ def invite():
                       sender=current_app.config.get("MAIL_USERNAME"),
                       recipients=[email])
     message.html = render_template('invitation_email.html', email=invitation.email, code=invitation.code, admin=g.user)
-    mail.send(message)
 
     db.session.add(invitation)
+    outbox.enqueue(message)
     db.session.commit()
+    mail_sender.wake()
     flash(f'Invited {email} to {invitation.event.title}!', 'success')
     app.logger.info(f'{g.user.username} invited {email} to {invitation.event.title}')
     return redirect(url_for('admin.manage_event', event_id=event_id))
 
 
+@admin.route('/admin/invites/bulk', methods=['POST'])
+@login_required
+def bulk_invite():
+    event_id = request.form.get('eventId')
+    is_admin_invite = request.form.get('isAdminInvite')
+    event = Event.query.get(event_id)
+    if event is None:
+        abort(404)
+    if not can_manage(event):
+        abort(401)
+
+    text = request.form.get('emails') or ''
+    upload = request.files.get('csv')
+    if upload:
+        text += '\n' + upload.read().decode('utf-8', errors='replace')
+
+    results = invite_many(event, parse_emails(text), g.user, is_admin=bool(is_admin_invite))
+    invited = sum(1 for _, result in results if result == 'invited')
+    flash(f'Invited {invited} of {len(results)} addresses to {event.title}!', 'success' if invited else 'warning')
+    app.logger.info(f'{g.user.username} bulk invited {invited} of {len(results)} addresses to {event.title}')
+    return render_template('invite_report.html', event=event, results=results)
+
+
+def invite_many(event, emails, inviter, is_admin=False):
+    """
+    Invites every address to the event in a single transaction and queues all invitation emails together.
+    Returns (email, result) pairs in input order, where result is one of 'invited', 'duplicate', 'registered'
+    or 'pending'. Addresses are compared (and invited) trimmed and lower cased.
+    """
+    emails = [email.strip().lower() for email in emails]
+    unique = list(dict.fromkeys(emails))
+    # accounts and invites created before addresses were normalized may still be mixed case
+    registered = {row.username.lower() for row in db.session.query(User.username)
+                  .filter(db.func.lower(User.username).in_(unique))}
+    pending = {row.email.lower() for row in db.session.query(Invite.email)
+               .filter(Invite.event_id == event.id, db.func.lower(Invite.email).in_(unique), Invite.is_used == 0,
+                       Invite.expires_on > datetime.now())}
+
+    results = []
+    invitations = []
+    messages = []
+    seen = set()
+    for email in emails:
+        if email in seen:
+            results.append((email, 'duplicate'))
+            continue
+        seen.add(email)
+
+        if email in registered:
+            results.append((email, 'registered'))
+        elif email in pending:
+            results.append((email, 'pending'))
+        else:
+            code = generate_code()
+            invitations.append(dict(email=email, event_id=event.id, code=code, is_admin=1 if is_admin else 0,
+                                    invited_by=inviter.id))
+            message = Message('You have been invited to participate in a Gifted exchange!',
+                              sender=current_app.config.get("MAIL_USERNAME"),
+                              recipients=[email])
+            message.html = render_template('invitation_email.html', email=email, code=code, admin=inviter)
+            messages.append(message)
+            results.append((email, 'invited'))
+
+    if invitations:
+        db.session.execute(Invite.__table__.insert(), invitations)
+        outbox.enqueue_many(messages)
+        db.session.commit()
+        mail_sender.wake()
+    return results
+
+
 @admin.route('/admin/invites/<invite_id>/revoke', methods=['POST'])
 @login_required
 def revoke(invite_id):
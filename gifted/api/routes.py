@@ -0,0 +1,215 @@
+import hashlib
+from functools import wraps
+
+from flask import Blueprint, request, url_for, g, jsonify
+from sqlalchemy.orm import joinedload, load_only
+from werkzeug.exceptions import abort
+
+from gifted import app, db
+from gifted.authz import has_role
+from gifted.main.routes import format_progress
+from gifted.models import User, Event, Item, Transaction, Pair, WishlistSummary, event_user
+
+api = Blueprint('api', __name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# the fields each resource can return; clients pick a subset with ?fields=a,b,c and always get the id
+ITEM_FIELDS = ['id', 'description', 'price', 'location', 'priority', 'notes', 'image', 'image_status', 'claimed']
+PURCHASE_FIELDS = ['id', 'item_id', 'description', 'price', 'giftee_id', 'giftee_name', 'transacted_on']
+
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if g.identity is None:
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@api.errorhandler(400)
+@api.errorhandler(401)
+@api.errorhandler(404)
+def http_error(error):
+    db.session.rollback()
+    return jsonify(error=error.name, message=error.description), error.code
+
+
+def load_event(event_id):
+    """Loads the event and checks the caller takes part in it."""
+    event = Event.query.options(load_only('id', 'title', 'description', 'starts_on', 'ends_on', 'generation')) \
+        .get(event_id)
+    if event is None:
+        abort(404)
+    if not has_role(event, 'member'):
+        abort(401)
+    return event
+
+
+def not_modified(event):
+    """
+    Every response is a function of the request, the caller and the event's generation, which is bumped on every
+    write that could change it. So the ETag can be checked before running any of the queries behind the response.
+    """
+    g.etag = hashlib.sha1(f'{request.full_path}:{g.identity.id}:{event.generation}'.encode()).hexdigest()
+    return request.if_none_match.contains(g.etag)
+
+
+def conditional(payload):
+    response = jsonify(payload) if payload is not None else app.response_class(status=304)
+    response.set_etag(g.etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def requested_fields(allowed):
+    fields = request.args.get('fields')
+    if not fields:
+        return allowed
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        abort(400, f'Unknown fields: {", ".join(sorted(unknown))}')
+    return ['id'] + [field for field in fields if field != 'id']
+
+
+def page_args():
+    """Keyset pagination: results are newest first and ?cursor=<id> continues below the last id seen."""
+    try:
+        # not request.args.get(type=int), which quietly ignores a cursor that isn't a number
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor is not None else None
+        limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        abort(400, 'cursor and limit must be integers')
+    if limit < 1:
+        abort(400, 'limit must be positive')
+    return cursor, limit
+
+
+def paginate(query, column, cursor, limit):
+    if cursor is not None:
+        query = query.filter(column < cursor)
+    rows = query.order_by(column.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+@api.route('/api/v1/events/<event_id>')
+@api_login_required
+def event(event_id):
+    event = load_event(event_id)
+    if not_modified(event):
+        return conditional(None)
+
+    pair = Pair.query.options(joinedload(Pair.giftee).load_only('id', 'first_name', 'last_name')) \
+        .filter_by(event_id=event.id, gifter_id=g.identity.id) \
+        .first()
+    participants = db.session.query(db.func.count(event_user.c.user_id)) \
+        .filter(event_user.c.event_id == event.id) \
+        .scalar()
+    return conditional({
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'starts_on': event.starts_on.isoformat() if event.starts_on else None,
+        'ends_on': event.ends_on.isoformat() if event.ends_on else None,
+        'participants': participants,
+        'giftee': {'id': pair.giftee.id, 'name': pair.giftee.get_full_name()} if pair is not None else None,
+        'liability': str(WishlistSummary.lookup(event.id, g.identity.id).liability),
+    })
+
+
+@api.route('/api/v1/events/<event_id>/progress')
+@api_login_required
+def progress(event_id):
+    event = load_event(event_id)
+    if not_modified(event):
+        return conditional(None)
+
+    # like the event page, nobody sees their own progress or the progress of their children's wishlists
+    hidden = {row.id for row in db.session.query(User.id).filter(User.parent_id == g.identity.id)}
+    hidden.add(g.identity.id)
+    summaries = WishlistSummary.query.filter(WishlistSummary.event_id == event.id, WishlistSummary.item_count > 0)
+    return conditional({
+        'progress': {str(summary.user_id): format_progress(summary)
+                     for summary in summaries if summary.user_id not in hidden},
+    })
+
+
+@api.route('/api/v1/events/<event_id>/wishlists/<int:user_id>/items')
+@api_login_required
+def wishlist_items(event_id, user_id):
+    event = load_event(event_id)
+    fields = requested_fields(ITEM_FIELDS)
+    cursor, limit = page_args()
+    if not_modified(event):
+        return conditional(None)
+
+    owner = User.query.options(load_only('id', 'parent_id')).get(user_id)
+    if owner is None:
+        abort(404)
+    # the owner (or their parent) must not find out what has been claimed
+    show_claimed = g.identity.id not in (owner.id, owner.parent_id)
+
+    columns = {'description', 'price', 'location', 'priority', 'notes', 'image_status'} & set(fields)
+    if 'image' in fields:
+        columns |= {'image_hash', 'has_image'}
+    options = [load_only('id', *columns)]
+    if 'claimed' in fields and show_claimed:
+        options.append(joinedload(Item.transaction).load_only('id'))
+    query = Item.query.options(*options).filter_by(event_id=event.id, user_id=owner.id)
+    items, next_cursor = paginate(query, Item.id, cursor, limit)
+
+    def serialize(item):
+        data = {}
+        for field in fields:
+            if field == 'price':
+                data[field] = str(item.price)
+            elif field == 'image':
+                data[field] = url_for('main.item_image', item_id=item.id, v=item.image_hash) \
+                    if item.has_image else None
+            elif field == 'claimed':
+                if show_claimed:
+                    data[field] = item.transaction is not None
+            else:
+                data[field] = getattr(item, field)
+        return data
+
+    return conditional({'items': [serialize(item) for item in items], 'next_cursor': next_cursor})
+
+
+@api.route('/api/v1/events/<event_id>/purchases/<int:user_id>')
+@api_login_required
+def purchases(event_id, user_id):
+    event = load_event(event_id)
+    fields = requested_fields(PURCHASE_FIELDS)
+    cursor, limit = page_args()
+    if not_modified(event):
+        return conditional(None)
+
+    options = [load_only('id', 'item_id', 'giftee_id', 'transacted_on')]
+    if {'description', 'price'} & set(fields):
+        options.append(joinedload(Transaction.item).load_only('id', 'description', 'price'))
+    if 'giftee_name' in fields:
+        options.append(joinedload(Transaction.giftee).load_only('id', 'first_name', 'last_name'))
+    query = Transaction.query.options(*options).filter_by(event_id=event.id, gifter_id=user_id)
+    transactions, next_cursor = paginate(query, Transaction.id, cursor, limit)
+
+    def serialize(transaction):
+        values = {
+            'id': lambda: transaction.id,
+            'item_id': lambda: transaction.item_id,
+            'description': lambda: transaction.item.description,
+            'price': lambda: str(transaction.item.price),
+            'giftee_id': lambda: transaction.giftee_id,
+            'giftee_name': lambda: transaction.giftee.get_full_name(),
+            'transacted_on': lambda: transaction.transacted_on.isoformat() if transaction.transacted_on else None,
+        }
+        return {field: values[field]() for field in fields}
+
+    return conditional({'purchases': [serialize(transaction) for transaction in transactions],
+                        'next_cursor': next_cursor})
@@ -0,0 +1,123 @@
+import time
+from functools import wraps
+
+from flask import g, session, current_app
+from werkzeug.exceptions import abort
+
+from gifted import db
+from gifted.models import Event, SiteAdmin, event_user, event_admin
+
+# the membership table behind each event role
+ROLES = {
+    'member': event_user,
+    'admin': event_admin,
+}
+MAX_SESSION_EVENTS = 16
+
+
+def has_role(event, role, user_id=None):
+    """
+    Whether the user (the current one by default) has `role` in the event, answered with one indexed EXISTS query.
+    Answers are memoized for the rest of the request and, for the current user, in their session for as long as the
+    event's generation stays the same; every membership change bumps it.
+    """
+    user_id = user_id if user_id is not None else g.identity.id
+    grants = g.setdefault('grants', {})
+    key = (event.id, user_id, role)
+    if key not in grants:
+        granted = session_grant(event, role) if user_id == session.get('user_id') else None
+        if granted is None:
+            table = ROLES[role]
+            granted = db.session.query(db.exists().where(db.and_(table.c.event_id == event.id,
+                                                                 table.c.user_id == user_id))).scalar()
+            if user_id == session.get('user_id'):
+                remember_grant(event, role, granted)
+        grants[key] = granted
+    return grants[key]
+
+
+def is_site_admin(user_id=None):
+    user_id = user_id if user_id is not None else g.identity.id
+    grants = g.setdefault('grants', {})
+    key = (None, user_id, 'site_admin')
+    if key not in grants:
+        cached = session_grants().get('site_admin') if user_id == session.get('user_id') else None
+        ttl = current_app.config.get('SESSION_IDENTITY_TTL', 300)
+        if cached is not None and time.time() - cached[0] < ttl:
+            grants[key] = cached[1]
+        else:
+            grants[key] = SiteAdmin.contains(user_id)
+            if user_id == session.get('user_id') and current_app.config.get('SESSION_AUTHZ_CACHE'):
+                session_grants(create=True)['site_admin'] = [int(time.time()), grants[key]]
+                session.modified = True
+    return grants[key]
+
+
+def can_manage(event, user_id=None):
+    return has_role(event, 'admin', user_id) or is_site_admin(user_id)
+
+
+def administers_anything(user_id):
+    """Whether the user runs any event or the whole site, for deciding whether to show them the admin pages."""
+    return db.session.query(db.or_(db.exists().where(event_admin.c.user_id == user_id),
+                                   db.exists().where(SiteAdmin.user_id == user_id))).scalar()
+
+
+def session_grants(create=False):
+    grants = session.get('grants')
+    # grants belong to whoever was logged in when they were stored
+    if grants is None or grants.get('user_id') != session.get('user_id'):
+        if not create:
+            return {}
+        grants = session['grants'] = {'user_id': session.get('user_id'), 'events': {}}
+    return grants
+
+
+def session_grant(event, role):
+    if not current_app.config.get('SESSION_AUTHZ_CACHE'):
+        return None
+    generation, roles = session_grants().get('events', {}).get(str(event.id), (None, {}))
+    return roles.get(role) if generation == event.generation else None
+
+
+def remember_grant(event, role, granted):
+    if not current_app.config.get('SESSION_AUTHZ_CACHE'):
+        return
+    events = session_grants(create=True)['events']
+    generation, roles = events.pop(str(event.id), (None, {}))
+    if generation != event.generation:
+        roles = {}
+    roles[role] = granted
+    events[str(event.id)] = [event.generation, roles]
+    # the cookie has to stay small, so only the most recently used events are kept
+    for stale in list(events)[:-MAX_SESSION_EVENTS]:
+        del events[stale]
+    session.modified = True
+
+
+def event_access_required(role):
+    """
+    Loads the event named by the view's `event_id` (404 if there is none) and lets the request through only if the
+    current user has `role` in it. Site admins manage every event. Use it below @login_required.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                event = Event.query.get(int(kwargs['event_id']))
+            except ValueError:
+                event = None
+            if event is None:
+                abort(404)
+            allowed = can_manage(event) if role == 'admin' else has_role(event, role)
+            if not allowed:
+                abort(401)
+            # as an int, the view's own Event.query.get(event_id) is answered from the identity map
+            kwargs['event_id'] = event.id
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+member_required = event_access_required('member')
+event_admin_required = event_access_required('admin')
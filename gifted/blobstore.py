@@ -0,0 +1,85 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """
+    Stores immutable blobs (e.g. item thumbnails) under the sha256 of their content. Unless a store is `durable`, its
+    blobs may vanish, so callers keep another copy of anything they cannot afford to lose.
+    """
+
+    durable = False
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def put(self, data):
+        pass
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+
+class FileSystemBlobStore(BlobStore):
+    def __init__(self, root, durable=False):
+        self.root = root
+        self.durable = durable
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, data):
+        key = content_hash(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temp file first so concurrent readers never see a partially written blob
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return key
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+
+class MemoryBlobStore(BlobStore):
+    def __init__(self):
+        self.blobs = {}
+
+    def get(self, key):
+        return self.blobs.get(key)
+
+    def put(self, data):
+        key = content_hash(data)
+        self.blobs[key] = data
+        return key
+
+
+backends = {
+    'filesystem': lambda app: FileSystemBlobStore(app.config['BLOB_STORE_PATH'],
+                                                  durable=app.config.get('BLOB_STORE_DURABLE', False)),
+    'memory': lambda app: MemoryBlobStore(),
+}
+
+
+def create_blob_store(app):
+    return backends[app.config.get('BLOB_STORE_BACKEND', 'filesystem')](app)
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.orm import undefer
+
+from gifted import app, db, blob_store, mail_sender, metadata_cache
+from gifted.admin.routes import invite_many
+from gifted.helpers import parse_emails
+from gifted.models import Item, WishlistSummary, OutboundEmail, Event, User
+from gifted.schema import SchemaOutOfDate, check_schema
+
+images_cli = AppGroup('images', help='Manage wishlist item thumbnails.')
+summary_cli = AppGroup('summary', help='Manage the per-participant wishlist summary table.')
+outbox_cli = AppGroup('outbox', help='Manage the outbound email queue.')
+invites_cli = AppGroup('invites', help='Manage event invitations.')
+metadata_cli = AppGroup('metadata', help='Manage the product link metadata cache.')
+schema_cli = AppGroup('schema', help='Inspect the database schema.')
+
+
+@images_cli.command('migrate')
+@click.option('--batch-size', default=100, show_default=True, help='Number of items to move per commit.')
+def migrate_images(batch_size):
+    """
+    Copy thumbnails stored in the item table into the blob store. The item table's copies are only removed once the
+    blob store is durable (BLOB_STORE_DURABLE), so running this again after making it durable finishes the move.
+    """
+    query = db.session.query(Item.id).filter(Item.image.isnot(None))
+    if not blob_store.durable:
+        query = query.filter(Item.image_hash.is_(None))
+    item_ids = [row.id for row in query.order_by(Item.id)]
+    verb = 'Moved' if blob_store.durable else 'Copied'
+
+    for i in range(0, len(item_ids), batch_size):
+        batch = item_ids[i:i + batch_size]
+        for item in Item.query.options(undefer(Item.image)).filter(Item.id.in_(batch)):
+            item.image_hash = blob_store.put(item.image)
+            if blob_store.durable:
+                item.image = None
+        db.session.commit()
+        click.echo(f'{verb} {min(i + batch_size, len(item_ids))} of {len(item_ids)} thumbnails')
+
+    if not blob_store.durable:
+        click.echo('The blob store is not durable, so the item table keeps its thumbnails too')
+    app.logger.info(f'{verb} {len(item_ids)} thumbnails to the blob store')
+
+
+@summary_cli.command('rebuild')
+@click.option('--event-id', type=int, help='Only rebuild summaries for this event.')
+def rebuild_summary(event_id):
+    """Recompute wishlist summaries from the item and transaction tables."""
+    count = WishlistSummary.rebuild(event_id)
+    click.echo(f'Rebuilt {count} wishlist summaries')
+    app.logger.info(f'Rebuilt {count} wishlist summaries')
+
+
+@summary_cli.command('verify')
+@click.option('--event-id', type=int, help='Only verify summaries for this event.')
+def verify_summary(event_id):
+    """Compare wishlist summaries against the item and transaction tables."""
+    mismatches = WishlistSummary.verify(event_id)
+    for event, user, counter, stored, expected in mismatches:
+        click.echo(f'event {event} user {user}: {counter} is {stored}, expected {expected}')
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} wishlist summary counters are out of date')
+    click.echo('Wishlist summaries are up to date')
+
+
+@outbox_cli.command('flush')
+def flush_outbox():
+    """Send every queued email that is due, without waiting for the background sender."""
+    delivered = mail_sender.flush()
+    click.echo(f'Sent {delivered} queued emails')
+
+
+@outbox_cli.command('status')
+def outbox_status():
+    """Show how many emails are in each outbox state."""
+    counts = db.session.query(OutboundEmail.status, db.func.count(OutboundEmail.id)).group_by(OutboundEmail.status)
+    for status, count in counts:
+        click.echo(f'{status}: {count}')
+
+
+@outbox_cli.command('retry')
+def retry_outbox():
+    """Requeue dead emails for another round of attempts."""
+    count = OutboundEmail.query.filter_by(status='dead') \
+        .update({'status': 'queued', 'attempts': 0, 'next_attempt_on': datetime.now()}, synchronize_session=False)
+    db.session.commit()
+    click.echo(f'Requeued {count} dead emails')
+
+
+@invites_cli.command('bulk')
+@click.argument('event_id', type=int)
+@click.argument('emails', type=click.File('r'))
+@click.option('--inviter', required=True, help='Username of the admin the invitations come from.')
+@click.option('--admin', 'is_admin', is_flag=True, help='Make every invitee an event administrator.')
+def bulk_invite(event_id, emails, inviter, is_admin):
+    """Invite every address in a pasted list or CSV file (use - for stdin) to an event."""
+    event = Event.query.get(event_id)
+    if event is None:
+        raise click.ClickException(f'Event {event_id} does not exist')
+    user = User.query.filter_by(username=inviter).first()
+    if user is None:
+        raise click.ClickException(f'User {inviter} does not exist')
+
+    results = invite_many(event, parse_emails(emails.read()), user, is_admin=is_admin)
+    for email, result in results:
+        click.echo(f'{email}: {result}')
+    app.logger.info(f'{user.username} bulk invited {len(results)} addresses to {event.title} from the command line')
+
+
+@metadata_cli.command('purge')
+def purge_metadata():
+    """Delete expired entries from the shared metadata cache."""
+    count = metadata_cache.purge()
+    click.echo(f'Purged {count} expired metadata lookups')
+
+
+@schema_cli.command('check')
+def check_schema_command():
+    """Exit with an error unless every migration has been applied."""
+    try:
+        check_schema(app, db, mode='fail')
+    except SchemaOutOfDate as e:
+        raise click.ClickException(str(e))
+    click.echo('Database schema is up to date')
+
+
+app.cli.add_command(images_cli)
+app.cli.add_command(summary_cli)
+app.cli.add_command(outbox_cli)
+app.cli.add_command(invites_cli)
+app.cli.add_command(metadata_cli)
+app.cli.add_command(schema_cli)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+
+from gifted.metacache import LRUCache
+
+
+class FragmentCache(ABC):
+    """
+    Stores rendered page fragments (or any JSON-serializable value). Keys embed the generation of the data they were
+    rendered from, so writers never delete anything; they bump the generation and stale entries simply age out.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        pass
+
+    def get_or_render(self, key, ttl, render):
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.set(key, value, ttl)
+        return value
+
+
+class NullFragmentCache(FragmentCache):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+
+class MemoryFragmentCache(FragmentCache):
+    """A per-process LRU; each gunicorn worker renders a fragment at most once per generation."""
+
+    def __init__(self, max_size):
+        self.entries = LRUCache(max_size)
+
+    def get(self, key):
+        return self.entries.get(key)[1]
+
+    def set(self, key, value, ttl):
+        self.entries.set(key, value, ttl)
+
+
+class FileSystemFragmentCache(FragmentCache):
+    """Shared by every worker on the host, so a fragment is rendered once per generation rather than once per worker."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry['expires_at'] <= time.time():
+            return None
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        os.makedirs(self.root, exist_ok=True)
+        # write to a temp file first so concurrent readers never see a partially written entry
+        fd, tmp = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'expires_at': time.time() + ttl, 'value': value}, f)
+        os.replace(tmp, self.path(key))
+
+    def purge(self):
+        """Deletes expired entries, returning how many were removed."""
+        count = 0
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            if name.startswith('tmp'):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                with open(path) as f:
+                    expired = json.load(f)['expires_at'] <= time.time()
+            except (OSError, ValueError, KeyError):
+                expired = True
+            if expired:
+                os.remove(path)
+                count += 1
+        return count
+
+
+backends = {
+    'null': lambda app: NullFragmentCache(),
+    'memory': lambda app: MemoryFragmentCache(app.config.get('FRAGMENT_CACHE_SIZE', 256)),
+    'filesystem': lambda app: FileSystemFragmentCache(app.config['FRAGMENT_CACHE_PATH']),
+}
+
+
+def create_fragment_cache(app):
+    return backends[app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')](app)
@@ -1,19 +1,27 @@
 import random
 import re
 import string
+import time
 from collections import defaultdict
 from functools import wraps
+from io import BytesIO
 from urllib.parse import urlparse
 
-import metadata_parser
 from flask import session, url_for, flash, g
 from werkzeug.utils import redirect
 
+from gifted.httpclient import ResponseTooLarge, TooManyRequests
+
+
+class TransientFetchError(Exception):
+    """A lookup that failed for a reason that may well be gone next time, like a timeout, a 429 or a 5xx."""
+    pass
+
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if session.get('user_id') is None or g.user is None:
+        if session.get('user_id') is None or g.identity is None:
             return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -27,13 +35,54 @@ def get_image_url_from_metadata(url):
     if is_amazon_domain(url):
         return get_amazon_image_url(url)
     else:
+        # metadata_parser pulls in BeautifulSoup, so it is only imported by the workers that fetch something
+        import metadata_parser
+        from gifted import app, http_client, metrics
+        started = time.perf_counter()
         try:
-            page = metadata_parser.MetadataParser(url=url, search_head_only=True)
-            return page.get_metadata_link('image')
+            final_url, html = http_client.get_html_head(url)
+            page = metadata_parser.MetadataParser(url=final_url, html=html, search_head_only=True)
+            image_url = page.get_metadata_link('image')
+            outcome = 'found' if image_url else 'missing'
+            return image_url
         except Exception as e:
-            from gifted import app
+            outcome = 'error'
             app.logger.warn(f'Could not fetch image metadata from {urlparse(url).hostname}. {e}')
+            if is_transient(e):
+                raise TransientFetchError(str(e)) from e
             return None
+        finally:
+            metrics.observe('gifted_fetch_duration_seconds', time.perf_counter() - started, kind='metadata',
+                            outcome=outcome)
+
+
+def is_transient(e):
+    """Whether a failed fetch is worth trying again later, as opposed to a page that is missing or unparseable."""
+    import requests
+    if isinstance(e, (requests.Timeout, requests.ConnectionError, TooManyRequests)):
+        return True
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return False
+
+
+def get_thumbnail(image_url, size=(250, 250)):
+    from PIL import Image
+    from gifted import http_client, metrics
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        image = Image.open(BytesIO(http_client.get_image(image_url)))
+        image.thumbnail(size)
+        b = BytesIO()
+        image.save(b, format='PNG')
+        outcome = 'ok'
+        return b.getvalue()
+    except ResponseTooLarge:
+        outcome = 'too_large'
+        raise
+    finally:
+        metrics.observe('gifted_fetch_duration_seconds', time.perf_counter() - started, kind='image', outcome=outcome)
 
 
 def is_amazon_domain(s):
@@ -58,6 +107,11 @@ def get_amazon_image_url(url):
         return None
 
 
+def parse_emails(text):
+    """Splits a pasted list or CSV export into email addresses, keeping their original order."""
+    return [token.strip('"\'<>') for token in re.split(r'[\s,;]+', text) if '@' in token]
+
+
 def group_by(iterable, projection):
     result = defaultdict(list)
     for item in iterable:
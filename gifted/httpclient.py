@@ -0,0 +1,161 @@
+import socket
+import time
+from threading import BoundedSemaphore, Event, Lock, Timer
+from urllib.parse import urlsplit
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class TooManyRequests(Exception):
+    """Raised when no fetch slot frees up in time, either for the host or for the process as a whole."""
+    pass
+
+
+class HttpClient(object):
+    """
+    The one way gifted talks to other sites. Every fetch shares a connection pool, is bounded by connect, read and
+    total timeouts and a response size cap, and holds a slot for its host and a global slot while it runs, so a slow
+    or hostile retailer can only tie up a few threads instead of pinning a worker.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, total_timeout=20, max_html_bytes=512 * 1024,
+                 max_image_bytes=5 * 1024 * 1024, max_per_host=2, max_in_flight=8, slot_timeout=30,
+                 max_hosts=256, user_agent='Mozilla/5.0 (compatible; gifted)'):
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.max_html_bytes = max_html_bytes
+        self.max_image_bytes = max_image_bytes
+        self.max_per_host = max_per_host
+        self.max_in_flight = max_in_flight
+        self.slot_timeout = slot_timeout
+        self.max_hosts = max_hosts
+        self.user_agent = user_agent
+        self._in_flight = BoundedSemaphore(max_in_flight)
+        self._hosts = {}
+        self._session = None
+        self._lock = Lock()
+        # callables taking (url, elapsed ms), told about every fetch whether it succeeded or not
+        self.observers = []
+
+    @property
+    def session(self):
+        # created (and requests imported) on first use, so forked workers never share the parent's sockets and
+        # processes that never fetch anything never pay for the import
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.max_in_flight)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = self.user_agent
+                self._session = session
+            return self._session
+
+    def host_slots(self, host):
+        with self._lock:
+            # dicts keep insertion order, so moving the host to the end keeps the least recently used one first
+            slots = self._hosts.pop(host, None) or BoundedSemaphore(self.max_per_host)
+            self._hosts[host] = slots
+            while len(self._hosts) > self.max_hosts:
+                # a fetch still holding an evicted semaphore releases it as usual; it just isn't handed out again
+                del self._hosts[next(iter(self._hosts))]
+            return slots
+
+    def get(self, url, max_bytes, stop_at=None):
+        """
+        Returns (final url, body bytes, declared charset). Reading stops early once `stop_at` has been seen, and
+        ResponseTooLarge is raised if the body would exceed `max_bytes`.
+        """
+        host = urlsplit(url).hostname
+        host_slots = self.host_slots(host)
+        if not host_slots.acquire(timeout=self.slot_timeout):
+            raise TooManyRequests(f'Too many requests in flight to {host}')
+        try:
+            if not self._in_flight.acquire(timeout=self.slot_timeout):
+                raise TooManyRequests('Too many outbound requests in flight')
+            started = time.perf_counter()
+            try:
+                return self._get(url, max_bytes, stop_at)
+            finally:
+                self._in_flight.release()
+                for observer in self.observers:
+                    observer(url, (time.perf_counter() - started) * 1000)
+        finally:
+            host_slots.release()
+
+    def _get(self, url, max_bytes, stop_at):
+        import requests
+
+        deadline = time.monotonic() + self.total_timeout
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            length = response.headers.get('Content-Length')
+            if stop_at is None and length is not None and length.isdigit() and int(length) > max_bytes:
+                raise ResponseTooLarge(f'{url} is {length} bytes, more than the {max_bytes} allowed')
+
+            # the read timeout applies to every recv, so a server trickling a byte at a time never trips it; shut the
+            # socket down at the deadline instead, which wakes up whatever read is blocked on it
+            expired = Event()
+            watchdog = Timer(max(deadline - time.monotonic(), 0), self._cut_off, [response, expired])
+            watchdog.daemon = True
+            watchdog.start()
+            body = bytearray()
+            try:
+                for chunk in response.iter_content(chunk_size=16 * 1024):
+                    body.extend(chunk)
+                    if stop_at is not None and stop_at in body[-len(chunk) - len(stop_at):].lower():
+                        break
+                    if len(body) > max_bytes:
+                        if stop_at is not None:
+                            # a head this big is almost certainly not going to end, so parse what we have
+                            break
+                        raise ResponseTooLarge(f'{url} is more than the {max_bytes} bytes allowed')
+                    if time.monotonic() > deadline:
+                        raise requests.Timeout(f'{url} took more than {self.total_timeout}s to download')
+            except requests.RequestException:
+                if expired.is_set():
+                    raise requests.Timeout(f'{url} took more than {self.total_timeout}s to download')
+                raise
+            finally:
+                watchdog.cancel()
+            if expired.is_set():
+                # a body without a length just looks like it ended early once the socket is shut down
+                raise requests.Timeout(f'{url} took more than {self.total_timeout}s to download')
+            charset = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+            return response.url, bytes(body[:max_bytes]), charset
+
+    @staticmethod
+    def _cut_off(response, expired):
+        expired.set()
+        # the socket behind the body stream; the connection itself lets go of it once the server says it will close
+        sock = getattr(getattr(getattr(response.raw, '_fp', None), 'fp', None), 'raw', None)
+        sock = getattr(sock, '_sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def get_html_head(self, url):
+        """Returns (final url, text) for a page, reading no further than the end of its <head>."""
+        final_url, body, charset = self.get(url, self.max_html_bytes, stop_at=b'</head>')
+        return final_url, body.decode(charset or 'utf-8', errors='replace')
+
+    def get_image(self, url):
+        return self.get(url, self.max_image_bytes)[1]
+
+
+def create_http_client(app):
+    return HttpClient(connect_timeout=app.config.get('HTTP_CONNECT_TIMEOUT', 3.05),
+                      read_timeout=app.config.get('HTTP_READ_TIMEOUT', 10),
+                      total_timeout=app.config.get('HTTP_TOTAL_TIMEOUT', 20),
+                      max_html_bytes=app.config.get('HTTP_MAX_HTML_BYTES', 512 * 1024),
+                      max_image_bytes=app.config.get('HTTP_MAX_IMAGE_BYTES', 5 * 1024 * 1024),
+                      max_per_host=app.config.get('HTTP_MAX_PER_HOST', 2),
+                      max_in_flight=app.config.get('HTTP_MAX_IN_FLIGHT', 8),
+                      max_hosts=app.config.get('HTTP_MAX_HOSTS', 256))
@@ -0,0 +1,96 @@
+import hashlib
+import time
+
+from flask import session, request, has_request_context, current_app, g, url_for
+from flask.ctx import _AppCtxGlobals
+from werkzeug.exceptions import abort
+from werkzeug.utils import redirect
+
+# endpoints that never need to know who is asking, so g.user is never looked up for them
+ANONYMOUS_ENDPOINTS = {'static', 'main.static', 'admin.static', 'main.item_image'}
+# requests that only read; anything else re-checks the account behind a session snapshot before it runs
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class Identity(object):
+    """The user fields that templates and access checks need, as snapshotted into the signed session cookie."""
+    fields = ['id', 'username', 'first_name', 'last_name', 'parent_id']
+
+    def __init__(self, **kwargs):
+        for field in self.fields:
+            setattr(self, field, kwargs.get(field))
+
+    def __repr__(self):
+        return '<Identity id=%r, username=%r>' % (self.id, self.username)
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'
+
+
+class LazyGlobals(_AppCtxGlobals):
+    """Resolves g.user and g.identity on first access, so requests that never use them never query for them."""
+
+    def __getattr__(self, name):
+        if name == 'user':
+            value = load_user()
+        elif name == 'identity':
+            value = load_identity()
+        else:
+            raise AttributeError(name)
+        setattr(self, name, value)
+        return value
+
+
+def password_fingerprint(password_hash):
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
+def remember(user):
+    session['user_id'] = user.id
+    if current_app.config.get('SESSION_IDENTITY_SNAPSHOT'):
+        snapshot = {field: getattr(user, field) for field in Identity.fields}
+        snapshot['fingerprint'] = password_fingerprint(user.password)
+        snapshot['checked_on'] = int(time.time())
+        session['identity'] = snapshot
+
+
+def forget():
+    for key in ['user_id', 'username', 'is_admin', 'identity', 'grants']:
+        session.pop(key, None)
+
+
+def is_anonymous_request():
+    return not has_request_context() or request.endpoint in ANONYMOUS_ENDPOINTS
+
+
+def is_stale(snapshot):
+    return time.time() - snapshot['checked_on'] >= current_app.config.get('SESSION_IDENTITY_TTL', 300)
+
+
+def load_user():
+    if is_anonymous_request() or session.get('user_id') is None:
+        return None
+
+    from gifted.models import User
+    user = User.query.get(session['user_id'])
+    snapshot = session.get('identity')
+
+    # a deleted account or a changed password invalidates every outstanding session for it
+    if user is None or (snapshot is not None and snapshot['fingerprint'] != password_fingerprint(user.password)):
+        forget()
+        abort(redirect(url_for('main.login')))
+
+    if snapshot is not None and is_stale(snapshot):
+        remember(user)
+    return user
+
+
+def load_identity():
+    if is_anonymous_request() or session.get('user_id') is None:
+        return None
+
+    snapshot = session.get('identity')
+    # a deleted account or a reset password must not keep changing data on an old cookie until the snapshot expires
+    if snapshot is not None and not is_stale(snapshot) and request.method in SAFE_METHODS:
+        return Identity(**snapshot)
+    return g.user
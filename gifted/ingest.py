@@ -0,0 +1,138 @@
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from gifted.helpers import get_image_url_from_metadata, get_thumbnail
+from gifted.httpclient import ResponseTooLarge
+
+IMAGE_PENDING = 'pending'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+
+
+class ImageIngestor(ABC):
+    """
+    Looks up, downloads and thumbnails the image for a wishlist item outside of the request that created it.
+    Backends only decide where `process` runs; the fetch functions can be swapped out so nothing touches the network.
+    """
+
+    def __init__(self, app, blob_store, fetch_image_url=get_image_url_from_metadata, fetch_thumbnail=get_thumbnail,
+                 retries=3, backoff=1.0):
+        self.app = app
+        self.blob_store = blob_store
+        self.fetch_image_url = fetch_image_url
+        self.fetch_thumbnail = fetch_thumbnail
+        self.retries = retries
+        self.backoff = backoff
+
+    @abstractmethod
+    def submit(self, item_id):
+        pass
+
+    def process(self, item_id):
+        from gifted import db, metrics
+        from gifted.models import Item, Event
+
+        # the fetch can take several timeouts and backoff sleeps, so no session (or pooled connection) is held across it
+        with self.app.app_context():
+            location = db.session.query(Item.location).filter_by(id=item_id).scalar()
+        if not location:
+            return None
+
+        image_url, image = self.fetch(location)
+        image_hash = self.blob_store.put(image) if image is not None else None
+
+        with self.app.app_context():
+            item = Item.query.get(item_id)
+            if item is None:
+                # deleted while we were fetching
+                return None
+            item.image_url = image_url
+            if image_hash is not None:
+                item.image_hash = image_hash
+                if not self.blob_store.durable:
+                    # the item image route falls back to this copy when the blob has gone
+                    item.image = image
+                item.image_status = IMAGE_READY
+            else:
+                item.image_status = IMAGE_FAILED
+            Event.bump_generation(item.event_id)
+            db.session.commit()
+            metrics.inc('gifted_image_ingest_total', status=item.image_status)
+            return item.image_status
+
+    def fetch(self, location):
+        # a timeout, 429 or 5xx from the product page is retried just like a failed thumbnail download
+        image_url = None
+        for attempt in range(self.retries):
+            try:
+                if image_url is None:
+                    image_url = self.fetch_image_url(location)
+                    if image_url is None:
+                        return None, None
+                return image_url, self.fetch_thumbnail(image_url)
+            except ResponseTooLarge as e:
+                # the same image will be just as big next time
+                self.app.logger.warn(f'Skipping image from {image_url}. {e}')
+                break
+            except Exception as e:
+                what = f'image from {image_url}' if image_url is not None else f'image metadata from {location}'
+                self.app.logger.warn(f'Failed to download {what} (attempt {attempt + 1} of {self.retries}). {e}')
+                if attempt + 1 < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        return image_url, None
+
+
+class InlineIngestor(ImageIngestor):
+    """Processes items on the calling thread, which is handy for tests and one-off scripts."""
+
+    def submit(self, item_id):
+        return self.process(item_id)
+
+
+class ThreadPoolIngestor(ImageIngestor):
+    """Processes items on a bounded pool of background threads owned by the current worker process."""
+
+    def __init__(self, app, blob_store, max_workers=4, **kwargs):
+        super().__init__(app, blob_store, **kwargs)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = Lock()
+
+    @property
+    def executor(self):
+        # the pool is created on first use so that forked workers never inherit the parent's threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='gifted-ingest')
+            return self._executor
+
+    def submit(self, item_id):
+        return self.executor.submit(self._process_logged, item_id)
+
+    def _process_logged(self, item_id):
+        try:
+            return self.process(item_id)
+        except Exception as e:
+            self.app.logger.error(f'Image ingestion failed for item {item_id}. {e}')
+
+
+backends = {
+    'inline': InlineIngestor,
+    'thread': ThreadPoolIngestor,
+}
+
+
+def create_ingestor(app, blob_store, metadata_cache=None):
+    backend = app.config.get('IMAGE_INGEST_BACKEND', 'thread')
+    kwargs = {
+        'retries': app.config.get('IMAGE_INGEST_RETRIES', 3),
+        'backoff': app.config.get('IMAGE_INGEST_BACKOFF', 1.0),
+    }
+    if metadata_cache is not None:
+        kwargs['fetch_image_url'] = metadata_cache.get_image_url
+    if backend == 'thread':
+        kwargs['max_workers'] = app.config.get('IMAGE_INGEST_WORKERS', 4)
+    return backends[backend](app, blob_store, **kwargs)
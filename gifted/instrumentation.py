@@ -0,0 +1,146 @@
+import os
+import sys
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# frames from these files are never the interesting call site of a statement
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+SKIPPED_FILES = {os.path.abspath(__file__)}
+
+
+class RequestTiming(object):
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.http_ms = 0.0
+        self.statements = []
+        self.counts = Counter()
+        self.call_sites = {}
+        self._render_depth = 0
+        self._render_started = None
+
+    def record_statement(self, statement, elapsed_ms, call_site):
+        self.db_ms += elapsed_ms
+        self.statements.append((elapsed_ms, statement, call_site))
+        self.counts[statement] += 1
+        self.call_sites.setdefault(statement, call_site)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def current_timing():
+    # g.get never triggers the lazy user lookup, and engine events also fire outside of requests
+    return g.get('request_timing') if has_request_context() else None
+
+
+def call_site():
+    """The innermost frame in gifted itself (including templates) that led to the current statement."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PACKAGE_DIR) and filename not in SKIPPED_FILES:
+            return f'{os.path.relpath(filename, PACKAGE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class Instrumentation(object):
+    """
+    Opt-in per-request timing. Hooks SQLAlchemy engine events, template signals and the outbound HTTP client, reports
+    the totals in a Server-Timing header, logs requests slower than a threshold with their slowest statements, and
+    warns when the same statement runs more than `n_plus_one` times in one request.
+    """
+
+    def __init__(self, app, db, http_client, slow_request_ms=500, slow_statements=5, n_plus_one=10):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.slow_statements = slow_statements
+        self.n_plus_one = n_plus_one
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        before_render_template.connect(self.before_render, app)
+        template_rendered.connect(self.after_render, app)
+        http_client.observers.append(self.record_http)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self.after_cursor_execute)
+
+    def before_request(self):
+        g.request_timing = RequestTiming()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if current_timing() is not None:
+            context._gifted_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        timing = current_timing()
+        started = getattr(context, '_gifted_started', None)
+        if timing is not None and started is not None:
+            timing.record_statement(statement, (time.perf_counter() - started) * 1000, call_site())
+
+    def before_render(self, sender, template, context, **extra):
+        timing = current_timing()
+        if timing is not None:
+            # templates rendered while rendering another (e.g. an email body) are already inside its time
+            if timing._render_depth == 0:
+                timing._render_started = time.perf_counter()
+            timing._render_depth += 1
+
+    def after_render(self, sender, template, context, **extra):
+        timing = current_timing()
+        if timing is not None and timing._render_depth > 0:
+            timing._render_depth -= 1
+            if timing._render_depth == 0:
+                timing.render_ms += (time.perf_counter() - timing._render_started) * 1000
+
+    def record_http(self, url, elapsed_ms):
+        timing = current_timing()
+        if timing is not None:
+            timing.http_ms += elapsed_ms
+
+    def after_request(self, response):
+        timing = current_timing()
+        if timing is None:
+            return response
+
+        total_ms = timing.elapsed_ms()
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_ms:.1f};desc="{len(timing.statements)} queries"',
+            f'render;dur={timing.render_ms:.1f}',
+            f'http;dur={timing.http_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        for statement, count in timing.counts.items():
+            if count > self.n_plus_one:
+                self.app.logger.warn(f'Possible N+1 on {request.method} {request.path}: statement ran {count} times, '
+                                     f'first from {timing.call_sites[statement]}: {one_line(statement)}')
+
+        if total_ms >= self.slow_request_ms:
+            slowest = sorted(timing.statements, key=lambda s: s[0], reverse=True)[:self.slow_statements]
+            lines = [f'  {elapsed:.1f}ms at {site}: {one_line(statement)}' for elapsed, statement, site in slowest]
+            self.app.logger.warn('\n'.join([
+                f'Slow request {request.method} {request.path} took {total_ms:.1f}ms '
+                f'(db {timing.db_ms:.1f}ms over {len(timing.statements)} queries, render {timing.render_ms:.1f}ms, '
+                f'http {timing.http_ms:.1f}ms)'] + lines))
+        return response
+
+
+def one_line(statement, limit=300):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+def create_instrumentation(app, db, http_client):
+    if not app.config.get('INSTRUMENTATION'):
+        return None
+    return Instrumentation(app, db, http_client,
+                           slow_request_ms=app.config.get('SLOW_REQUEST_MS', 500),
+                           slow_statements=app.config.get('SLOW_REQUEST_STATEMENTS', 5),
+                           n_plus_one=app.config.get('N_PLUS_ONE_THRESHOLD', 10))
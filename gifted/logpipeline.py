@@ -0,0 +1,172 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+import traceback
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from threading import Lock
+
+from flask import g, has_request_context, request, session
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s: %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the request fields RequestContextFilter attached."""
+
+    fields = ['request_id', 'user_id', 'route', 'method', 'path', 'duration_ms', 'status']
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage(),
+        }
+        for field in self.fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Runs on the thread that logs, while the request it is describing is still around."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user_id = session.get('user_id')
+            record.route = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            started = g.get('log_started')
+            if started is not None and getattr(record, 'duration_ms', None) is None:
+                record.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+
+class PipelineHandler(QueueHandler):
+    """Hands records to the pipeline's queue without ever waiting; records are dropped and counted if it is full."""
+
+    def __init__(self, pipeline):
+        super().__init__(None)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # everything the sinks need is resolved here, because args and tracebacks do not survive the queue
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(record)
+
+
+class LogPipeline(object):
+    """
+    Request threads only ever put records on a bounded queue. A listener thread owned by each worker process
+    formats them and writes them to the configured sinks, so logging never blocks a request on file I/O or
+    rotation. The sinks are opened lazily in the process that writes to them, so forked workers never share them.
+    """
+
+    def __init__(self, sinks, formatter, queue_size=10000):
+        self.sinks = sinks
+        self.formatter = formatter
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._lock = Lock()
+        self._queue = None
+        self._listener = None
+        self._pid = None
+        atexit.register(self.stop)
+
+    def put(self, record):
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # a forked worker starts its own queue and thread; the parent's thread did not survive the fork
+            self._queue = queue.Queue(self.queue_size)
+            handlers = [factory() for factory in self.sinks]
+            for handler in handlers:
+                handler.setFormatter(self.formatter)
+            self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None:
+                self._listener.stop()
+                for handler in self._listener.handlers:
+                    handler.close()
+                self._pid = None
+
+
+def open_log_file(path, max_bytes, backup_count):
+    # each process writes its own file, as rotating one file from several processes loses records
+    path = path.format(pid=os.getpid())
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+
+
+sinks = {
+    'stdout': lambda app: lambda: logging.StreamHandler(sys.stdout),
+    'stderr': lambda app: lambda: logging.StreamHandler(sys.stderr),
+    'file': lambda app: lambda: open_log_file(app.config['LOG_FILE'], app.config.get('LOG_MAX_BYTES', 10485760),
+                                              app.config.get('LOG_BACKUP_COUNT', 10)),
+}
+
+
+def log_requests(app, access_log=False):
+    def before_request():
+        g.log_started = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    def after_request(response):
+        request_id = g.get('request_id')
+        if request_id is not None:
+            response.headers['X-Request-ID'] = request_id
+        if access_log:
+            app.logger.info(f'{request.method} {request.path} {response.status_code}',
+                            extra={'status': response.status_code})
+        return response
+
+    app.before_request(before_request)
+    app.after_request(after_request)
+
+
+def create_log_pipeline(app):
+    names = [name.strip() for name in app.config.get('LOG_SINKS', 'stdout').split(',') if name.strip()]
+    formatter = JsonFormatter() if app.config.get('LOG_FORMAT', 'json') == 'json' else logging.Formatter(TEXT_FORMAT)
+    pipeline = LogPipeline([sinks[name](app) for name in names], formatter,
+                           queue_size=app.config.get('LOG_QUEUE_SIZE', 10000))
+
+    handler = PipelineHandler(pipeline)
+    handler.addFilter(RequestContextFilter())
+    del app.logger.handlers[:]
+    app.logger.addHandler(handler)
+    app.logger.setLevel(logging.INFO)
+    log_requests(app, access_log=app.config.get('LOG_REQUESTS', False))
+    return pipeline
@@ -1,28 +1,26 @@
 from datetime import datetime
-from io import BytesIO
 
-import requests
-from PIL import Image
-from flask import Blueprint, render_template, request, flash, url_for, session, current_app, g
+from flask import Blueprint, render_template, request, flash, url_for, session, current_app, g, \
+    get_template_attribute
 from flask_mail import Message
+from sqlalchemy.orm import joinedload, load_only
 from werkzeug import security
 from werkzeug.exceptions import abort
 from werkzeug.utils import redirect
 
-from gifted import login_required, validate, db, mail, app
-from gifted.helpers import generate_code, group_by, get_image_url_from_metadata
-from gifted.models import User, Invite, Event, Item, Transaction, Reset, SiteAdmin
+from gifted import login_required, validate, db, app, image_ingestor, blob_store, mail_sender, outbox, fragment_cache
+from gifted.authz import member_required, administers_anything
+from gifted.blobstore import content_hash
+from gifted.helpers import generate_code
+from gifted.identity import remember, forget
+from gifted.ingest import IMAGE_PENDING
+from gifted.models import User, Invite, Event, Item, Transaction, Reset, WishlistSummary, Pair, event_child
 
 main = Blueprint('main', __name__,
                  template_folder='templates',
                  static_folder='static')
 
-
-@app.before_request
-def load_user():
-    if session.get('user_id') is not None:
-        user = User.query.get(session['user_id'])
-        g.user = user
+PERSON = ('id', 'first_name', 'last_name', 'parent_id')
 
 
 @main.route('/')
@@ -47,12 +45,9 @@ def login():
         # password is valid, proceed to set session cookie and redirect to index
         # otherwise, flash a friendly message
         if security.check_password_hash(pwhash=user.password, password=password):
-            session['user_id'] = user.id
+            remember(user)
             session['username'] = request.form.get('username')
-            session['is_admin'] = \
-                len(user.administration) > 0 \
-                or user.is_admin \
-                or SiteAdmin.contains(user.id)
+            session['is_admin'] = user.is_admin or administers_anything(user.id)
             app.logger.info(f'{user.username} logged in')
             return redirect(url_for('main.index'))
         else:
@@ -65,11 +60,11 @@ def login():
 
 @main.route('/logout')
 def logout():
-    session.pop('user_id', None)
-    session.pop('username', None)
-    session.pop('is_admin', None)
-    app.logger.info(f'{g.user.username} logged out')
+    if g.identity is not None:
+        app.logger.info(f'{g.identity.username} logged out')
+    forget()
     g.pop('user', None)
+    g.pop('identity', None)
     return redirect(url_for('main.login'))
 
 
@@ -107,6 +102,7 @@ def register():
         event.users.append(user)
         if invitation.is_admin:
             event.admins.append(user)
+        Event.bump_generation(event.id)
         invitation.is_used = 1
         db.session.add(user)
         db.session.commit()
@@ -121,21 +117,15 @@ def register():
 
 @main.route('/events/<event_id>')
 @login_required
+@member_required
 def event(event_id):
-    event = Event.query.get(event_id)
-    if event is None:
-        abort(404)
-    if g.user not in event.users:
-        abort(401)
-
-    liability = Transaction.get_user_liability(event.id, g.user.id)
-    progress = get_event_progress(event_id)
-    pair = event.get_recipient(g.user.id)
-    return render_template('event.html', event=event, progress=progress, liability=liability, pair=pair)
+    view = load_event_view(event_id, g.identity.id)
+    return render_template('event.html', **view)
 
 
 @main.route('/events/<event_id>/wishlists/<user_id>', methods=['GET', 'POST'])
 @login_required
+@member_required
 def wishlist(event_id, user_id):
     if request.method == 'POST':
         description = request.form.get('description')
@@ -147,20 +137,15 @@ def wishlist(event_id, user_id):
                     event_id=event_id, user_id=user_id)
 
         if location:
-            image_url = get_image_url_from_metadata(location)
-            if image_url is not None:
-                try:
-                    image = Image.open(requests.get(image_url, stream=True).raw)
-                    image.thumbnail((250, 250))
-                    b = BytesIO()
-                    image.save(b, format='PNG')
-                    item.image_url = image_url
-                    item.image = b.getvalue()
-                except Exception as e:
-                    app.logger.warn(f'Failed to download image from {image_url}. {e}')
+            item.image_status = IMAGE_PENDING
 
         db.session.add(item)
+        db.session.flush()
+        WishlistSummary.item_added(item)
+        Event.bump_generation(event_id)
         db.session.commit()
+        if location:
+            image_ingestor.submit(item.id)
         flash(f'Added {item.description} to your wishlist!', 'success')
         return redirect(url_for('main.wishlist', event_id=event_id, user_id=user_id))
 
@@ -170,30 +155,58 @@ def wishlist(event_id, user_id):
     if user is None:
         abort(404)
 
-    if g.user not in event.users:
-        abort(401)
-
-    items = Item.query.filter_by(event_id=event_id, user_id=user_id).order_by(Item.id.desc()).all()
+    items = Item.query \
+        .options(load_only('id', 'user_id', 'description', 'price', 'location', 'priority', 'notes',
+                           'image_status', 'image_hash', 'has_image'),
+                 joinedload(Item.transaction).load_only('id', 'gifter_id')) \
+        .filter_by(event_id=event_id, user_id=user_id) \
+        .order_by(Item.id.desc()) \
+        .all()
     progress = get_wishlist_progress(event_id, user_id)
     return render_template('wishlist.html', event=event, user=user, wishlist=items, progress=progress)
 
 
 @main.route('/items/<item_id>/image')
 def item_image(item_id):
-    item = Item.query.get(item_id)
-    return app.response_class(item.image, mimetype='image/png')
+    item = db.session.query(Item.id, Item.image_hash).filter_by(id=item_id).first()
+    if item is None:
+        abort(404)
+
+    etag = item.image_hash
+    if etag is not None and request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        image = blob_store.get(etag) if etag is not None else None
+        if image is None:
+            # thumbnails ingested before the blob store existed still live in the item table
+            image = db.session.query(Item.image).filter_by(id=item_id).scalar()
+            if image is None:
+                abort(404)
+            etag = content_hash(image)
+        response = app.response_class(image, mimetype='image/png')
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if request.args.get('v') == etag:
+        # hashed urls never change content, so browsers can keep them forever
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @main.route('/events/<event_id>/wishlists/<user_id>/children')
+@login_required
+@member_required
 def children(event_id, user_id):
     event = Event.query.get(event_id)
-    if g.user not in event.users and g.user.id != user_id:
-        abort(401)
     return render_template('children.html', event=event)
 
 
 @main.route('/events/<event_id>/purchases/<user_id>')
 @login_required
+@member_required
 def purchases(event_id, user_id):
     event = Event.query.get(event_id)
     user = User.query.get(user_id)
@@ -201,14 +214,9 @@ def purchases(event_id, user_id):
     if user is None:
         abort(404)
 
-    if g.user not in event.users:
-        abort(401)
-
-    transactions = Transaction.query.filter_by(event_id=event_id, gifter_id=user_id).all()
-    liability = Transaction.get_user_liability(event_id, user_id)
-    grouped_transactions = group_by(transactions, projection=lambda x: x.giftee.get_full_name())
-    return render_template('purchases.html', event=event, purchases=transactions, liability=liability,
-                           grouped_transactions=grouped_transactions)
+    groups, liability = Transaction.get_purchases(event.id, user.id)
+    return render_template('purchases.html', event=event, user=user, groups=groups, liability=liability,
+                           count=sum(len(group['purchases']) for group in groups))
 
 
 @main.route('/events/<event_id>/wishlists/<user_id>/items/<item_id>/delete', methods=['POST'])
@@ -217,6 +225,8 @@ def remove_item(event_id, user_id, item_id):
     item_id = request.form.get('item_id')
     item = Item.query.get(item_id)
     description = item.description
+    WishlistSummary.item_removed(item)
+    Event.bump_generation(item.event_id)
     db.session.delete(item)
     db.session.commit()
     flash(f'You deleted "{description}" from your wishlist!', 'warning')
@@ -225,29 +235,39 @@ def remove_item(event_id, user_id, item_id):
 
 @main.route('/events/<event_id>/wishlists/<user_id>/transactions', methods=['POST'])
 @login_required
+@member_required
 def claim_item(event_id, user_id):
-    item_id = request.form.get('item_id')
-    gifter_id = request.form.get('gifter_id')
-    giftee_id = request.form.get('giftee_id')
+    item = Item.query.get(request.form.get('item_id'))
+    if item is None or str(item.event_id) != str(event_id):
+        abort(404)
 
-    transaction = Transaction(event_id=event_id, item_id=item_id, gifter_id=gifter_id, giftee_id=giftee_id)
-    db.session.add(transaction)
+    # whoever is logged in is the gifter, and the item's owner is the giftee, whatever the form says; like the wishlist
+    # page, nobody can claim from their own list or their child's
+    owner = User.query.get(item.user_id)
+    if g.identity.id in (owner.id, owner.parent_id):
+        flash('You cannot claim items from your own or your child\'s wishlist!', 'warning')
+        return redirect(url_for('main.wishlist', event_id=event_id, user_id=user_id))
+    if not Transaction.claim(item, g.identity.id):
+        flash('Someone has already claimed that item!', 'warning')
+        return redirect(url_for('main.wishlist', event_id=event_id, user_id=user_id))
+    description, first_name = item.description, owner.first_name
     db.session.commit()
 
-    flash(f'You claimed "{transaction.item.description}" for {transaction.giftee.first_name}!', 'success')
+    flash(f'You claimed "{description}" for {first_name}!', 'success')
     return redirect(url_for('main.wishlist', event_id=event_id, user_id=user_id))
 
 
 @main.route('/events/<event_id>/wishlists/<user_id>/transactions/<transaction_id>/delete', methods=['POST'])
 @login_required
+@member_required
 def unclaim_item(event_id, user_id, transaction_id):
-    purchase = Transaction.query.get(transaction_id)
-    item = purchase.item.description
-    giftee = purchase.giftee.first_name
-
-    db.session.delete(purchase)
+    item = Transaction.unclaim(transaction_id, g.identity.id)
+    if item is None:
+        flash('That item is not claimed by you.', 'warning')
+        return redirect(url_for('main.purchases', event_id=event_id, user_id=user_id))
     db.session.commit()
-    flash(f'You unclaimed "{item}" for {giftee}!', 'warning')
+
+    flash(f'You unclaimed "{item.description}" for {User.query.get(item.user_id).first_name}!', 'warning')
     return redirect(url_for('main.purchases', event_id=event_id, user_id=user_id))
 
 
@@ -261,17 +281,17 @@ def forgot():
             return redirect(url_for('main.forgot'))
         code = generate_code()
         reset = Reset(user_id=user.id, code=code)
-        db.session.add(reset)
-        db.session.commit()
-
         message = Message('Gifted password reset',
                           sender=current_app.config.get("MAIL_USERNAME"),
                           recipients=[email])
-
         message.html = render_template('forgot_password_email.html', email=email, code=code)
-        mail.send(message)
+
+        db.session.add(reset)
+        outbox.enqueue(message)
+        db.session.commit()
+        mail_sender.wake()
         flash(f'A password reset email was sent to {email}!', 'success')
-        app.logger.info(f'Sent password reset email to {email}')
+        app.logger.info(f'Queued password reset email to {email}')
         return redirect(url_for('main.login'))
     return render_template('forgot.html')
 
@@ -326,22 +346,56 @@ def is_active(starts_on, ends_on):
     return True if starts_on < now < ends_on else False
 
 
-def get_event_progress(event_id):
-    progress = {}
-    user_total_result = Item.get_wishlist_totals(event_id)
-    for row in user_total_result:
-        user_id = row[0]
-        total = row[1]
-        purchased = Transaction.get_user_total(event_id, user_id)
-        percent = purchased / total * 100 if total != 0 else 0
-        progress[user_id] = {'purchased': str(purchased), 'total': str(total), 'percent': "{:.2f}".format(percent)}
-
-    return progress
+def load_event_view(event_id, user_id):
+    """
+    Everything event.html renders for one participant. The participant cards and everyone's progress look the same to
+    every viewer, so they come from the fragment cache keyed by the event's generation; only the viewer's own pair
+    and liability are loaded on every request.
+    """
+    event = Event.query.get(event_id)
+    if event is None:
+        return None
+
+    participants = fragment_cache.get_or_render(f'event:{event.id}:{event.generation}:participants',
+                                                app.config.get('FRAGMENT_CACHE_TTL', 3600),
+                                                lambda: render_participants(event))
+    pair = Pair.query \
+        .options(joinedload(Pair.giftee).load_only(*PERSON)) \
+        .filter_by(event_id=event.id, gifter_id=user_id) \
+        .first()
+    return {
+        'event': event,
+        'cards': participants['cards'],
+        'pair': pair,
+        'progress': {int(key): progress for key, progress in participants['progress'].items()},
+        'liability': WishlistSummary.lookup(event.id, user_id).liability,
+        'manages_children': user_id in participants['parents'],
+    }
+
+
+def render_participants(event):
+    users = User.query.with_parent(event, 'users').options(load_only(*PERSON)).all()
+    parents = db.session.query(User.parent_id) \
+        .join(event_child, event_child.c.user_id == User.id) \
+        .filter(event_child.c.event_id == event.id, User.parent_id.isnot(None)) \
+        .distinct()
+    summaries = WishlistSummary.query.filter(WishlistSummary.event_id == event.id, WishlistSummary.item_count > 0)
+    progress = {summary.user_id: format_progress(summary) for summary in summaries}
+
+    card = get_template_attribute('event_cards.html', 'participant_card')
+    return {
+        'cards': [{'id': user.id, 'parent_id': user.parent_id, 'name': user.get_full_name(),
+                   'html': str(card(event, user, progress.get(user.id)))} for user in users],
+        # keyed by string so the fragment survives a round trip through JSON
+        'progress': {str(user_id): user_progress for user_id, user_progress in progress.items()},
+        'parents': [row.parent_id for row in parents],
+    }
 
 
 def get_wishlist_progress(event_id, user_id):
-    total = Item.get_wishlist_total(event_id, user_id)
-    purchased = Transaction.get_user_total(event_id, user_id)
-    percent = purchased / total * 100 if total != 0 else 0
-    progress = {'purchased': str(purchased), 'total': str(total), 'percent': "{:.2f}".format(percent)}
-    return progress
+    return format_progress(WishlistSummary.lookup(event_id, user_id))
+
+
+def format_progress(summary):
+    return {'purchased': str(summary.claimed_total), 'total': str(summary.wishlist_total),
+            'percent': "{:.2f}".format(summary.get_percent())}
@@ -0,0 +1,86 @@
+import random
+from itertools import permutations
+
+
+class MatchmakingError(Exception):
+    pass
+
+
+def build_pairs(participants, forbidden=(), rng=None, max_attempts=50, max_swaps=20):
+    """
+    Returns {gifter: giftee} arranging every participant into one gift-giving circle, so nobody draws themselves,
+    and no (gifter, giftee) pair in `forbidden` is used. Each attempt is O(n): shuffle the circle, then repair any
+    forbidden hand-off by swapping the giftee with a random participant whose neighbours are still allowed.
+    """
+    participants = list(dict.fromkeys(participants))
+    if len(participants) < 2:
+        raise MatchmakingError('A minimum of two participants is required')
+
+    rng = rng or random.Random()
+    forbidden = set(forbidden)
+    for _ in range(max_attempts):
+        rng.shuffle(participants)
+        if _repair(participants, forbidden, rng, max_swaps):
+            n = len(participants)
+            return {participants[i]: participants[(i + 1) % n] for i in range(n)}
+
+    raise MatchmakingError('Could not find an arrangement that satisfies every exclusion')
+
+
+def _repair(circle, forbidden, rng, max_swaps):
+    n = len(circle)
+
+    def allowed(position):
+        # the hand-off from `position` to the next participant in the circle
+        return (circle[position % n], circle[(position + 1) % n]) not in forbidden
+
+    def neighbourhood_allowed(*positions):
+        return all(allowed(p - 1) and allowed(p) for p in positions)
+
+    for i in range(n):
+        if allowed(i):
+            continue
+
+        giftee = (i + 1) % n
+        for _ in range(max_swaps):
+            j = rng.randrange(n)
+            if j == giftee:
+                continue
+            circle[giftee], circle[j] = circle[j], circle[giftee]
+            if neighbourhood_allowed(giftee, j):
+                break
+            circle[giftee], circle[j] = circle[j], circle[giftee]
+        else:
+            return False
+    return True
+
+
+def household_exclusions(households):
+    """Every ordered pair of participants who share a household, given {participant: household key}."""
+    members = {}
+    for participant, household in households.items():
+        members.setdefault(household, []).append(participant)
+    return {pair for group in members.values() for pair in permutations(group, 2)}
+
+
+def matchmake(participants, exclusions=(), households=None, history=None, rng=None):
+    """
+    Builds pairs that always honour explicit exclusions (in both directions) and, where possible, keep households
+    apart and avoid last time's giftee. If no arrangement exists, repeat avoidance is dropped first, then
+    household separation. Returns ({gifter: giftee}, names of the soft constraints that had to be dropped).
+    """
+    hard = set(exclusions) | {(b, a) for a, b in exclusions}
+    soft = [
+        ('households', household_exclusions(households or {})),
+        ('history', set((history or {}).items())),
+    ]
+
+    dropped = []
+    while True:
+        forbidden = hard.union(*(constraint for _, constraint in soft))
+        try:
+            return build_pairs(participants, forbidden, rng), dropped
+        except MatchmakingError:
+            if not soft:
+                raise
+            dropped.append(soft.pop()[0])
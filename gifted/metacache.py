@@ -0,0 +1,170 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict, Counter
+from datetime import datetime, timedelta
+from threading import Lock
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from sqlalchemy.exc import IntegrityError
+
+from gifted.helpers import TransientFetchError, get_image_url_from_metadata, is_amazon_domain
+
+# query parameters that only track where a link was shared from and never change the page
+TRACKING_PARAMS = re.compile(r'^(utm_.*|ref|ref_|tag|fbclid|gclid|igshid|mc_cid|mc_eid|psc|th)$')
+ASIN = re.compile(r'(?:dp|gp/product|d)/([A-Z0-9]{10})')
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def cache_key(url):
+    """Amazon links are keyed by ASIN, since the same product is shared under many different paths."""
+    if is_amazon_domain(url):
+        asin = ASIN.search(url)
+        if asin:
+            return f'asin:{asin.group(1)}'
+    return f'url:{normalize_url(url)}'
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class LRUCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Returns (found, value), dropping the entry if it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MetadataCache(object):
+    """
+    Caches the image url found for a product link, first in a per-process LRU and then in the metadata_lookup table
+    shared by every worker. Links that definitely have no usable image are cached too, for a shorter time, so a broken
+    page is not fetched again on every add; timeouts, 429s and 5xx are not cached at all.
+    """
+
+    def __init__(self, app, fetch=get_image_url_from_metadata, max_size=1024, ttl=604800, negative_ttl=3600):
+        self.app = app
+        self.fetch = fetch
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = LRUCache(max_size)
+        self.counters = Counter()
+        self._lock = Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, memory_size=len(self.memory))
+
+    def get_image_url(self, url):
+        key = cache_key(url)
+        found, image_url = self.memory.get(key)
+        if found:
+            self.count('memory_hits')
+            return image_url
+
+        found, image_url, expires_on = self.load(key)
+        if found:
+            self.count('db_hits')
+            self.memory.set(key, image_url, (expires_on - datetime.now()).total_seconds())
+            return image_url
+
+        self.count('misses')
+        try:
+            image_url = self.fetch(url)
+        except TransientFetchError:
+            # the site may well answer next time, so nothing is remembered and the caller decides whether to retry
+            self.count('transient_errors')
+            raise
+        if image_url is None:
+            self.count('negative_stores')
+        ttl = self.ttl if image_url is not None else self.negative_ttl
+        self.memory.set(key, image_url, ttl)
+        self.store(key, url, image_url, ttl)
+        return image_url
+
+    def load(self, key):
+        from gifted.models import MetadataLookup
+
+        # lookups happen between network fetches, so each tier access gets its own short-lived session
+        with self.app.app_context():
+            try:
+                entry = MetadataLookup.query.get(hash_key(key))
+            except Exception as e:
+                # the shared tier is an optimization, so a database hiccup only costs a fetch
+                self.app.logger.warn(f'Could not read the metadata cache. {e}')
+                return False, None, None
+            if entry is None or entry.expires_on <= datetime.now():
+                return False, None, None
+            return True, entry.image_url, entry.expires_on
+
+    def store(self, key, url, image_url, ttl):
+        from gifted import db
+        from gifted.models import MetadataLookup
+
+        now = datetime.now()
+        with self.app.app_context():
+            try:
+                db.session.merge(MetadataLookup(key=hash_key(key), url=url[:1024], image_url=image_url,
+                                                fetched_on=now, expires_on=now + timedelta(seconds=ttl)))
+                db.session.commit()
+            except IntegrityError:
+                # another worker stored the same link first
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warn(f'Could not write the metadata cache. {e}')
+
+    def purge(self):
+        """Deletes expired rows from the shared tier, returning how many were removed."""
+        from gifted import db
+        from gifted.models import MetadataLookup
+
+        count = MetadataLookup.query.filter(MetadataLookup.expires_on <= datetime.now()) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return count
+
+
+def create_metadata_cache(app):
+    return MetadataCache(app,
+                         max_size=app.config.get('METADATA_CACHE_SIZE', 1024),
+                         ttl=app.config.get('METADATA_CACHE_TTL', 604800),
+                         negative_ttl=app.config.get('METADATA_CACHE_NEGATIVE_TTL', 3600))
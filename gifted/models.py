@@ -1,25 +1,31 @@
-import random
-from copy import copy
 from datetime import datetime, timedelta
+from decimal import Decimal
 
-from sqlalchemy import func
+from flask_mail import Message
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
 
 from gifted import db
+from gifted import matchmaking
 
 event_user = db.Table('event_user',
-                      db.Column('event_id', db.Integer, db.ForeignKey('event.id')),
-                      db.Column('user_id', db.Integer, db.ForeignKey('user.id')))
+                      db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
+                      db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+                      db.Index('ix_event_user_user_id', 'user_id'))
 
 event_admin = db.Table('event_admin',
-                       db.Column('event_id', db.Integer, db.ForeignKey('event.id')),
-                       db.Column('user_id', db.Integer, db.ForeignKey('user.id')))
+                       db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
+                       db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+                       db.Index('ix_event_admin_user_id', 'user_id'))
 
 event_child = db.Table('event_child',
-                       db.Column('event_id', db.Integer, db.ForeignKey('event.id')),
-                       db.Column('user_id', db.Integer, db.ForeignKey('user.id')))
+                       db.Column('event_id', db.Integer, db.ForeignKey('event.id'), primary_key=True),
+                       db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+                       db.Index('ix_event_child_user_id', 'user_id'))
 
 
 class Pair(db.Model):
+    __table_args__ = (db.Index('ix_pair_event_id_gifter_id', 'event_id', 'gifter_id', unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     gifter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -31,6 +37,7 @@ class Pair(db.Model):
 
 
 class Reset(db.Model):
+    __table_args__ = (db.Index('ix_reset_user_id_code', 'user_id', 'code'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     code = db.Column(db.String(80), nullable=False)
@@ -47,7 +54,7 @@ class Reset(db.Model):
 
 class SiteAdmin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
 
     def __repr__(self):
         return '<SiteAdmin id=%r, user_id=%r>' % (self.id, self.user_id)
@@ -59,7 +66,7 @@ class SiteAdmin(db.Model):
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     registrar_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(240), nullable=False)
@@ -86,6 +93,9 @@ class User(db.Model):
 
 
 class Transaction(db.Model):
+    __table_args__ = (db.Index('ix_transaction_event_id_gifter_id', 'event_id', 'gifter_id'),
+                      # an item can only be claimed once; claim() relies on it when two people race for one item
+                      db.Index('ix_transaction_item_id', 'item_id', unique=True))
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
     item_id = db.Column(db.Integer, db.ForeignKey('item.id', ondelete='CASCADE'))
@@ -100,27 +110,77 @@ class Transaction(db.Model):
                (self.id, self.event_id, self.item_id, self.gifter_id, self.giftee_id)
 
     @classmethod
-    def get_user_liability(cls, event_id, user_id):
-        stmt = func.sum(Item.price).filter(Item.event_id == event_id, Item.id == Transaction.item_id,
-                                           Transaction.gifter_id == user_id)
-        total_result = db.session.query(stmt).first()
-        if total_result is not None and total_result[0] is not None:
-            return total_result[0]
-        else:
-            return 0
+    def claim(cls, item, gifter_id):
+        """
+        Claims the item for the gifter with a single INSERT ... SELECT that only inserts while the item has no
+        transaction; the unique index on item_id settles a race the check cannot see. Returns False, with the session
+        rolled back, if someone else got there first, so call it before making any other changes in the request.
+        """
+        claimed = db.select([db.literal(item.event_id), db.literal(item.id), db.literal(int(gifter_id)),
+                             db.literal(item.user_id), db.literal(datetime.now())]) \
+            .where(~db.exists().where(cls.item_id == item.id))
+        insert = cls.__table__.insert().from_select(['event_id', 'item_id', 'gifter_id', 'giftee_id', 'transacted_on'],
+                                                    claimed)
+        try:
+            inserted = db.session.execute(insert).rowcount
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        if inserted != 1:
+            return False
+        db.session.expire(item, ['transaction'])
+        WishlistSummary.item_claimed(item, gifter_id)
+        Event.bump_generation(item.event_id)
+        return True
+
+    @classmethod
+    def unclaim(cls, transaction_id, gifter_id):
+        """
+        Deletes the transaction only if it still exists and belongs to the gifter. Returns the item it was for, or
+        None if there was nothing of theirs to delete (someone else's claim, or a repeated request).
+        """
+        item = Item.query.join(cls, cls.item_id == Item.id) \
+            .filter(cls.id == transaction_id, cls.gifter_id == gifter_id).first()
+        if item is None:
+            return None
+        deleted = cls.query.filter_by(id=transaction_id, gifter_id=gifter_id).delete(synchronize_session=False)
+        if deleted != 1:
+            return None
+        db.session.expire(item, ['transaction'])
+        WishlistSummary.item_unclaimed(item, gifter_id)
+        Event.bump_generation(item.event_id)
+        return item
 
     @classmethod
-    def get_user_total(cls, event_id, user_id):
-        stmt = func.sum(Item.price).filter(Item.event_id == event_id, Item.id == Transaction.item_id,
-                                           Item.user_id == user_id)
-        total_result = db.session.query(stmt).first()
-        if total_result is not None and total_result[0] is not None:
-            return total_result[0]
-        else:
-            return 0
+    def get_purchases(cls, event_id, gifter_id):
+        """
+        The gifter's purchases grouped by giftee, from one query over transaction, item and giftee that also returns
+        each giftee's subtotal and the overall total as window sums. Returns (groups, total) where each group is
+        {'giftee_id', 'name', 'subtotal', 'purchases'}.
+        """
+        giftee = db.aliased(User)
+        rows = db.session.query(Transaction.id, Transaction.giftee_id, Transaction.transacted_on,
+                                Item.description, Item.price, giftee.first_name, giftee.last_name,
+                                func.sum(Item.price).over(partition_by=Transaction.giftee_id).label('subtotal'),
+                                func.sum(Item.price).over().label('total')) \
+            .join(Item, Item.id == Transaction.item_id) \
+            .join(giftee, giftee.id == Transaction.giftee_id) \
+            .filter(Transaction.event_id == event_id, Transaction.gifter_id == gifter_id) \
+            .order_by(giftee.first_name, giftee.last_name, Transaction.giftee_id, Transaction.transacted_on) \
+            .all()
+
+        groups = []
+        for row in rows:
+            if not groups or groups[-1]['giftee_id'] != row.giftee_id:
+                groups.append({'giftee_id': row.giftee_id, 'name': f'{row.first_name} {row.last_name}',
+                               'subtotal': row.subtotal, 'purchases': []})
+            groups[-1]['purchases'].append(row)
+        return groups, rows[0].total if rows else Decimal('0.00')
 
 
 class Invite(db.Model):
+    __table_args__ = (db.Index('ix_invite_email_code', 'email', 'code'),
+                      db.Index('ix_invite_event_id', 'event_id'))
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
     invited_by = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -144,8 +204,10 @@ class Event(db.Model):
     title = db.Column(db.String(240), nullable=False)
     description = db.Column(db.String(1024))
     created_on = db.Column(db.DateTime(), default=datetime.now())
-    starts_on = db.Column(db.DateTime())
+    starts_on = db.Column(db.DateTime(), index=True)
     ends_on = db.Column(db.DateTime())
+    # bumped whenever anything shown on the event page changes, which invalidates its cached fragments
+    generation = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     users = db.relationship('User',
                             secondary=event_user,
                             lazy=True)
@@ -159,6 +221,8 @@ class Event(db.Model):
                                lazy=True)
     pairs = db.relationship('Pair', backref='event', lazy=True, cascade="all, delete-orphan")
     invites = db.relationship('Invite', backref='event', lazy=True, cascade="all, delete-orphan")
+    summaries = db.relationship('WishlistSummary', lazy=True, cascade="all, delete-orphan")
+    exclusions = db.relationship('PairExclusion', lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
         return '<Event id=%r, title=%r>' % (self.id, self.title)
@@ -171,37 +235,120 @@ class Event(db.Model):
         now = datetime.now()
         return True if now > self.ends_on else False
 
-    def get_recipient(self, gifter_id):
-        return Pair.query.filter_by(gifter_id=gifter_id, event_id=self.id).first()
-
-    def matchmake(self, users):
-        giftees = copy(users)
-        random.shuffle(giftees)
+    @classmethod
+    def get_counts(cls, event_ids):
+        """Returns {event_id: (participants, pending invites)} for the given events in one query."""
+        if not event_ids:
+            return {}
+        # correlated counts rather than joins, which would multiply every participant by every invite
+        participants = db.select([func.count()]).where(event_user.c.event_id == cls.id).as_scalar()
+        invites = db.select([func.count()]).where(db.and_(Invite.event_id == cls.id, Invite.is_used == 0)).as_scalar()
+        rows = db.session.query(cls.id, participants, invites).filter(cls.id.in_(event_ids))
+        return {event_id: (participant_count, invite_count) for event_id, participant_count, invite_count in rows}
 
-        if len(users) == 0 or len(users) == 1:
+    @classmethod
+    def bump_generation(cls, *event_ids):
+        if event_ids:
+            cls.query.filter(cls.id.in_(event_ids)) \
+                .update({cls.generation: cls.generation + 1}, synchronize_session=False)
+
+    def add_members(self, users, as_admin=False):
+        """
+        Adds users to the event (and as admins, and as children where they have a parent) with at most one
+        existence check and one multi-row insert per membership table. Users who are already members are skipped.
+        Returns the users that were newly added as participants.
+        """
+        memberships = [(event_user, users), (event_child, [user for user in users if user.parent_id])]
+        if as_admin:
+            memberships.append((event_admin, users))
+
+        added = set()
+        changed = False
+        for table, members in memberships:
+            ids = {user.id for user in members}
+            if not ids:
+                continue
+            existing = {row.user_id for row in db.session.query(table.c.user_id)
+                        .filter(table.c.event_id == self.id, table.c.user_id.in_(ids))}
+            new_ids = sorted(ids - existing)
+            if new_ids:
+                db.session.execute(table.insert(), [dict(event_id=self.id, user_id=user_id) for user_id in new_ids])
+                changed = True
+            if table is event_user:
+                added.update(new_ids)
+        if changed:
+            # cached authorization answers are keyed by the generation, so new admins count as a change too
+            Event.bump_generation(self.id)
+        return [user for user in users if user.id in added]
+
+    def remove_member(self, user_id):
+        for table in [event_user, event_child]:
+            db.session.execute(table.delete().where(db.and_(table.c.event_id == self.id, table.c.user_id == user_id)))
+        Event.bump_generation(self.id)
+
+    def matchmake(self, users, rng=None):
+        """
+        Pairs up the given user ids and replaces their pairs for this event in one statement and one commit.
+        Returns the names of any soft constraints that had to be relaxed to find an arrangement.
+        """
+        user_ids = [int(user_id) for user_id in users]
+        if len(user_ids) < 2:
             return None
 
-        if users[-1] == giftees[0]:
-            return self.matchmake(users)
-
-        for gifter in users:
-            # treat recipients as a stack: if the user is shuffled as the recipient, grab the next (i.e. pop(-2))
-            if gifter == giftees[-1]:
-                giftee = giftees.pop(-2)
-            else:
-                giftee = giftees.pop()
+        from gifted import metrics
+
+        with metrics.timer('gifted_matchmake_duration_seconds'):
+            households = {row.id: row.parent_id or row.id
+                          for row in db.session.query(User.id, User.parent_id).filter(User.id.in_(user_ids))}
+            pairs, dropped = matchmaking.matchmake(user_ids,
+                                                   exclusions=PairExclusion.get_exclusions(self.id, user_ids),
+                                                   households=households,
+                                                   history=self.get_previous_pairs(user_ids),
+                                                   rng=rng)
+
+        Pair.query.filter(Pair.event_id == self.id, Pair.gifter_id.in_(user_ids)).delete(synchronize_session=False)
+        db.session.execute(Pair.__table__.insert(), [dict(event_id=self.id, gifter_id=gifter, giftee_id=giftee)
+                                                     for gifter, giftee in pairs.items()])
+        Event.bump_generation(self.id)
+        db.session.commit()
+        return dropped
+
+    def get_previous_pairs(self, user_ids):
+        """Each user's giftee from the most recent earlier event they were paired in, as {gifter_id: giftee_id}."""
+        rows = db.session.query(Pair.gifter_id, Pair.giftee_id) \
+            .join(Event, Event.id == Pair.event_id) \
+            .filter(Pair.gifter_id.in_(user_ids), Pair.event_id != self.id, Event.starts_on < self.starts_on) \
+            .order_by(Event.starts_on.desc())
+        previous = {}
+        for row in rows:
+            previous.setdefault(row.gifter_id, row.giftee_id)
+        return previous
+
+
+class PairExclusion(db.Model):
+    """Two users who must never be paired with each other, either in one event or (without an event) in any."""
+    __table_args__ = (db.Index('ix_pair_exclusion_event_id_user_id', 'event_id', 'user_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    excluded_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user = db.relationship('User', uselist=False, foreign_keys=[user_id])
+    excluded_user = db.relationship('User', uselist=False, foreign_keys=[excluded_user_id])
 
-            pair = Pair.query.filter_by(event_id=self.id, gifter_id=gifter).first()
-            if pair is not None:
-                pair.giftee_id = giftee
-            else:
-                pair = Pair(event_id=self.id, gifter_id=gifter, giftee_id=giftee)
+    def __repr__(self):
+        return '<PairExclusion event_id=%r, user_id=%r, excluded_user_id=%r>' % \
+               (self.event_id, self.user_id, self.excluded_user_id)
 
-            db.session.add(pair)
-            db.session.commit()
+    @classmethod
+    def get_exclusions(cls, event_id, user_ids):
+        rows = db.session.query(cls.user_id, cls.excluded_user_id) \
+            .filter(db.or_(cls.event_id == event_id, cls.event_id.is_(None)),
+                    cls.user_id.in_(user_ids), cls.excluded_user_id.in_(user_ids))
+        return [(row.user_id, row.excluded_user_id) for row in rows]
 
 
 class Item(db.Model):
+    __table_args__ = (db.Index('ix_item_event_id_user_id', 'event_id', 'user_id'),)
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -209,7 +356,11 @@ class Item(db.Model):
     price = db.Column(db.Numeric(5, 2), nullable=False)
     location = db.Column(db.String(1024))
     image_url = db.Column(db.String(1024))
-    image = db.Column(db.LargeBinary)
+    # thumbnails can be hundreds of KB, so only load them when explicitly asked for
+    image = db.deferred(db.Column(db.LargeBinary))
+    image_status = db.Column(db.String(40))
+    image_hash = db.Column(db.String(64))
+    has_image = db.column_property(db.or_(image_hash.isnot(None), image.columns[0].isnot(None)))
     priority = db.Column(db.String(40), default='medium')
     notes = db.Column(db.String(1024))
     transaction = db.relationship('Transaction', uselist=False, backref='item', cascade='all,delete')
@@ -218,16 +369,161 @@ class Item(db.Model):
         return '<Item id=%r, description=%r, price=%r, transaction=%r>' % \
                (self.id, self.description, self.price, self.transaction)
 
+
+class WishlistSummary(db.Model):
+    """
+    Running per-participant totals for an event, kept up to date in the same transaction as every item and
+    claim change so that read paths are primary key lookups instead of aggregates over item and transaction.
+    """
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    wishlist_total = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    claimed_total = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    liability = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    claimed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    counters = ['wishlist_total', 'claimed_total', 'liability', 'item_count', 'claimed_count']
+
+    def __repr__(self):
+        return '<WishlistSummary event_id=%r, user_id=%r, wishlist_total=%r, claimed_total=%r, liability=%r>' % \
+               (self.event_id, self.user_id, self.wishlist_total, self.claimed_total, self.liability)
+
+    def get_percent(self):
+        return self.claimed_total / self.wishlist_total * 100 if self.wishlist_total else 0
+
+    @classmethod
+    def lookup(cls, event_id, user_id):
+        summary = cls.query.get((event_id, user_id))
+        if summary is None:
+            summary = cls(event_id=event_id, user_id=user_id, **{name: 0 for name in cls.counters})
+        return summary
+
     @classmethod
-    def get_wishlist_total(cls, event_id, user_id):
-        stmt = func.sum(Item.price).filter(Item.event_id == event_id, Item.user_id == user_id)
-        total_result = db.session.query(stmt).first()
-        if total_result is not None and total_result[0] is not None:
-            return total_result[0]
-        else:
-            return 0
+    def adjust(cls, event_id, user_id, **deltas):
+        """Add deltas to a participant's counters as part of the current transaction."""
+        event_id, user_id = int(event_id), int(user_id)
+        values = {getattr(cls, name): getattr(cls, name) + delta for name, delta in deltas.items()}
+        updated = cls.query.filter_by(event_id=event_id, user_id=user_id).update(values, synchronize_session=False)
+        if not updated:
+            row = {name: 0 for name in cls.counters}
+            row.update(deltas)
+            db.session.add(cls(event_id=event_id, user_id=user_id, **row))
+            db.session.flush()
 
     @classmethod
-    def get_wishlist_totals(cls, event_id):
-        return Item.query.with_entities(Item.user_id, func.sum(Item.price).label('total')).filter_by(
-            event_id=event_id).group_by(Item.user_id).all()
+    def item_added(cls, item):
+        # freshly added items still carry the raw form value for price
+        cls.adjust(item.event_id, item.user_id, wishlist_total=Decimal(item.price), item_count=1)
+
+    @classmethod
+    def item_removed(cls, item):
+        cls.adjust(item.event_id, item.user_id, wishlist_total=-item.price, item_count=-1)
+        if item.transaction is not None:
+            cls.item_unclaimed(item, item.transaction.gifter_id)
+
+    @classmethod
+    def item_claimed(cls, item, gifter_id):
+        cls.adjust(item.event_id, item.user_id, claimed_total=item.price, claimed_count=1)
+        cls.adjust(item.event_id, gifter_id, liability=item.price)
+
+    @classmethod
+    def item_unclaimed(cls, item, gifter_id):
+        cls.adjust(item.event_id, item.user_id, claimed_total=-item.price, claimed_count=-1)
+        cls.adjust(item.event_id, gifter_id, liability=-item.price)
+
+    @classmethod
+    def compute(cls, event_id=None):
+        """Recompute every participant's counters from the item and transaction tables."""
+        claimed = Transaction.id.isnot(None)
+        items = db.session.query(Item.event_id, Item.user_id,
+                                 func.sum(Item.price).label('wishlist_total'),
+                                 func.count(Item.id).label('item_count'),
+                                 func.sum(case([(claimed, Item.price)], else_=0)).label('claimed_total'),
+                                 func.sum(case([(claimed, 1)], else_=0)).label('claimed_count')) \
+            .outerjoin(Transaction, Transaction.item_id == Item.id) \
+            .group_by(Item.event_id, Item.user_id)
+        liabilities = db.session.query(Item.event_id, Transaction.gifter_id,
+                                       func.sum(Item.price).label('liability')) \
+            .join(Transaction, Transaction.item_id == Item.id) \
+            .group_by(Item.event_id, Transaction.gifter_id)
+        if event_id is not None:
+            items = items.filter(Item.event_id == event_id)
+            liabilities = liabilities.filter(Item.event_id == event_id)
+
+        summaries = {}
+        for row in items:
+            summary = summaries.setdefault((row.event_id, row.user_id), {name: 0 for name in cls.counters})
+            for name in ['wishlist_total', 'item_count', 'claimed_total', 'claimed_count']:
+                summary[name] = getattr(row, name)
+        for row in liabilities:
+            summary = summaries.setdefault((row.event_id, row.gifter_id), {name: 0 for name in cls.counters})
+            summary['liability'] = row.liability
+        return summaries
+
+    @classmethod
+    def rebuild(cls, event_id=None):
+        summaries = cls.compute(event_id)
+        delete = cls.query if event_id is None else cls.query.filter_by(event_id=event_id)
+        delete.delete(synchronize_session=False)
+        if summaries:
+            db.session.execute(cls.__table__.insert(), [dict(event_id=key[0], user_id=key[1], **counters)
+                                                        for key, counters in summaries.items()])
+        bump = Event.query if event_id is None else Event.query.filter_by(id=event_id)
+        bump.update({Event.generation: Event.generation + 1}, synchronize_session=False)
+        db.session.commit()
+        return len(summaries)
+
+    @classmethod
+    def verify(cls, event_id=None):
+        """Returns (event_id, user_id, counter, stored, expected) for every counter that has drifted."""
+        expected = cls.compute(event_id)
+        stored = cls.query if event_id is None else cls.query.filter_by(event_id=event_id)
+        stored = {(row.event_id, row.user_id): row for row in stored}
+
+        mismatches = []
+        for key in sorted(set(expected) | set(stored)):
+            for name in cls.counters:
+                want = expected[key][name] if key in expected else 0
+                have = getattr(stored[key], name) if key in stored else 0
+                if (want or 0) != (have or 0):
+                    mismatches.append((key[0], key[1], name, have, want))
+        return mismatches
+
+
+class MetadataLookup(db.Model):
+    """The image url found for a product link, shared by every worker; a null image_url caches a failed lookup."""
+    key = db.Column(db.String(64), primary_key=True)
+    url = db.Column(db.String(1024), nullable=False)
+    image_url = db.Column(db.String(1024))
+    fetched_on = db.Column(db.DateTime(), nullable=False)
+    expires_on = db.Column(db.DateTime(), nullable=False, index=True)
+
+    def __repr__(self):
+        return '<MetadataLookup url=%r, image_url=%r, expires_on=%r>' % (self.url, self.image_url, self.expires_on)
+
+
+class OutboundEmail(db.Model):
+    __table_args__ = (db.Index('ix_outbound_email_status_next_attempt_on', 'status', 'next_attempt_on'),)
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(240), nullable=False)
+    sender = db.Column(db.String(240))
+    recipients = db.Column(db.String(1024), nullable=False)
+    html = db.Column(db.Text)
+    body = db.Column(db.Text)
+    status = db.Column(db.String(40), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(1024))
+    claimed_by = db.Column(db.String(40))
+    claimed_on = db.Column(db.DateTime())
+    created_on = db.Column(db.DateTime(), default=datetime.now)
+    next_attempt_on = db.Column(db.DateTime(), default=datetime.now)
+    sent_on = db.Column(db.DateTime())
+
+    def __repr__(self):
+        return '<OutboundEmail id=%r, recipients=%r, status=%r, attempts=%r>' % \
+               (self.id, self.recipients, self.status, self.attempts)
+
+    def to_message(self):
+        return Message(self.subject, sender=self.sender, recipients=self.recipients.split(','),
+                       html=self.html, body=self.body)
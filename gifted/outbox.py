@@ -0,0 +1,177 @@
+import os
+import smtplib
+import uuid
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+
+
+def enqueue(message):
+    """Adds a flask_mail Message to the outbox as part of the current transaction; it is sent after commit."""
+    from gifted import db
+    from gifted.models import OutboundEmail
+
+    email = OutboundEmail(subject=message.subject, sender=message.sender, recipients=','.join(message.recipients),
+                          html=message.html, body=message.body, status=QUEUED, attempts=0,
+                          next_attempt_on=datetime.now())
+    db.session.add(email)
+    return email
+
+
+def enqueue_many(messages):
+    """Adds many Messages to the outbox with a single multi-row insert as part of the current transaction."""
+    from gifted import db
+    from gifted.models import OutboundEmail
+
+    if messages:
+        now = datetime.now()
+        db.session.execute(OutboundEmail.__table__.insert(), [
+            dict(subject=message.subject, sender=message.sender, recipients=','.join(message.recipients),
+                 html=message.html, body=message.body, status=QUEUED, attempts=0, next_attempt_on=now)
+            for message in messages])
+
+
+class MailSender(object):
+    """
+    Drains the outbox from a background thread, sending each batch over a single SMTP connection. Failed messages
+    are retried with exponential backoff and parked as dead once they run out of attempts.
+    """
+
+    def __init__(self, app, mail, batch_size=50, max_attempts=5, backoff=30, poll_interval=60, claim_timeout=600):
+        self.app = app
+        self.mail = mail
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self._wakeup = Event()
+        self._thread = None
+        self._thread_pid = None
+        self._token = None
+        self._token_pid = None
+        self._lock = Lock()
+
+    @property
+    def token(self):
+        # a preloaded app is forked into every worker, and each one must claim messages under its own name
+        if self._token_pid != os.getpid():
+            self._token, self._token_pid = uuid.uuid4().hex, os.getpid()
+        return self._token
+
+    def start(self):
+        # started lazily so that each forked worker runs its own sender thread; the parent's did not survive the fork
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                self._thread = Thread(target=self.run, name='gifted-mail', daemon=True)
+                self._thread.start()
+                self._thread_pid = os.getpid()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.app.logger.error(f'Mail outbox flush failed. {e}')
+
+    def flush(self):
+        """Sends every message that is due over one SMTP connection, returning the number that were delivered."""
+        from gifted import db
+
+        delivered = 0
+        with self.app.app_context():
+            batch = self.claim()
+            if not batch:
+                return delivered
+            try:
+                with self.mail.connect() as connection:
+                    while batch:
+                        delivered += self.send(connection, batch)
+                        batch = self.claim()
+            except Exception as e:
+                # the connection could not be opened (or dropped), so whatever is left unsent failed with it
+                for email in batch:
+                    if email.status == SENT:
+                        delivered += 1
+                    elif email.status == SENDING:
+                        self.failed(email, e)
+                db.session.commit()
+        return delivered
+
+    def claim(self):
+        from gifted import db
+        from gifted.models import OutboundEmail
+
+        now = datetime.now()
+        abandoned = now - timedelta(seconds=self.claim_timeout)
+        due = db.session.query(OutboundEmail.id) \
+            .filter(db.or_(db.and_(OutboundEmail.status == QUEUED, OutboundEmail.next_attempt_on <= now),
+                           db.and_(OutboundEmail.status == SENDING, OutboundEmail.claimed_on < abandoned))) \
+            .order_by(OutboundEmail.id) \
+            .limit(self.batch_size)
+        ids = [row.id for row in due]
+        if not ids:
+            return []
+
+        # only one sender (thread or worker process) wins each message
+        token = self.token
+        OutboundEmail.query \
+            .filter(OutboundEmail.id.in_(ids),
+                    db.or_(OutboundEmail.status == QUEUED, OutboundEmail.claimed_on < abandoned)) \
+            .update({'status': SENDING, 'claimed_by': token, 'claimed_on': now}, synchronize_session=False)
+        db.session.commit()
+        return OutboundEmail.query.filter(OutboundEmail.id.in_(ids), OutboundEmail.status == SENDING,
+                                          OutboundEmail.claimed_by == token).order_by(OutboundEmail.id).all()
+
+    def send(self, connection, batch):
+        from gifted import db, metrics
+
+        delivered = 0
+        for email in batch:
+            try:
+                with metrics.timer('gifted_mail_send_duration_seconds'):
+                    connection.send(email.to_message())
+                email.status = SENT
+                email.sent_on = datetime.now()
+                delivered += 1
+            except smtplib.SMTPServerDisconnected:
+                raise
+            except Exception as e:
+                self.failed(email, e)
+        db.session.commit()
+        return delivered
+
+    def failed(self, email, error):
+        from gifted import metrics
+
+        metrics.inc('gifted_mail_send_failures_total')
+        email.attempts += 1
+        email.last_error = str(error)[:1024]
+        email.claimed_by = None
+        if email.attempts >= self.max_attempts:
+            email.status = DEAD
+            self.app.logger.error(f'Giving up on email {email.id} to {email.recipients}. {error}')
+        else:
+            email.status = QUEUED
+            email.next_attempt_on = datetime.now() + timedelta(seconds=self.backoff * 2 ** (email.attempts - 1))
+            self.app.logger.warn(f'Failed to send email {email.id} to {email.recipients} '
+                                 f'(attempt {email.attempts} of {self.max_attempts}). {error}')
+
+
+def create_mail_sender(app, mail):
+    return MailSender(app, mail,
+                      batch_size=app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50),
+                      max_attempts=app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5),
+                      backoff=app.config.get('MAIL_OUTBOX_BACKOFF', 30),
+                      poll_interval=app.config.get('MAIL_OUTBOX_POLL_INTERVAL', 60))
+
@@ -0,0 +1,280 @@
+import hmac
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from threading import Event, Lock, Thread
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+# name: (type, help, histogram buckets)
+DEFINITIONS = {
+    'gifted_request_duration_seconds': ('histogram', 'Time spent handling a request, by endpoint, method and status.',
+                                        REQUEST_BUCKETS),
+    'gifted_db_query_duration_seconds': ('histogram', 'Time spent executing a SQL statement, by operation.',
+                                         DB_BUCKETS),
+    'gifted_mail_send_duration_seconds': ('histogram', 'Time spent handing one email to the SMTP server.',
+                                          REQUEST_BUCKETS),
+    'gifted_mail_send_failures_total': ('counter', 'Emails that failed to send, including ones that will be retried.',
+                                        None),
+    'gifted_fetch_duration_seconds': ('histogram', 'Time spent fetching product metadata and images, by kind and '
+                                                   'outcome.', FETCH_BUCKETS),
+    'gifted_image_ingest_total': ('counter', 'Wishlist item images processed, by resulting status.', None),
+    'gifted_matchmake_duration_seconds': ('histogram', 'Time spent shuffling an event.', REQUEST_BUCKETS),
+}
+
+
+class Metrics(object):
+    """
+    Counters and histograms in the Prometheus text format, kept in this process. Every metric must be declared in
+    DEFINITIONS; samples are keyed by metric name and label values.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._values = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = DEFINITIONS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            # one count per bucket plus +Inf, then the sum
+            sample = self._values.setdefault(key, [0] * (len(buckets) + 1) + [0.0])
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            sample[index] += 1
+            sample[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def reset(self):
+        """Forgets what every process has recorded so far; gunicorn's master calls it before forking workers."""
+        pass
+
+    def mark_process_dead(self, pid):
+        """Called by gunicorn's master when worker `pid` has exited."""
+        pass
+
+    def render(self):
+        values = self.collect()
+        lines = []
+        for name, (kind, help, buckets) in DEFINITIONS.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (sample_name, labels), value in sorted(values.items(), key=lambda kv: kv[0]):
+                if sample_name != name:
+                    continue
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else format_value(bound)
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(value[-1])}')
+                lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class DirectoryMetrics(Metrics):
+    """
+    For several worker processes behind one endpoint. Each process periodically writes its own samples to a file in
+    a shared directory, and a scrape adds up every file, so whichever worker answers reports the same totals. The
+    samples of workers that have exited are folded into one archive file, so counters never go backwards and the
+    directory holds one file per live worker plus the archive.
+    """
+
+    ARCHIVE = 'archive.json'
+
+    def __init__(self, root, flush_interval=5, logger=None):
+        super().__init__()
+        self.root = root
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self._pid = None
+        self._path = None
+        self._dirty = Event()
+        self._thread = None
+
+    def inc(self, name, amount=1, **labels):
+        self.check_process()
+        super().inc(name, amount, **labels)
+        self._dirty.set()
+
+    def observe(self, name, value, **labels):
+        self.check_process()
+        super().observe(name, value, **labels)
+        self._dirty.set()
+
+    def check_process(self):
+        if self._pid == os.getpid():
+            return
+        # a forked worker starts from nothing rather than reporting its parent's samples a second time
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pid is not None:
+                    self._values = {}
+                self._pid = os.getpid()
+                self._path = os.path.join(self.root, f'{self._pid}-{uuid.uuid4().hex}.json')
+                self._dirty = Event()
+                self._thread = Thread(target=self.run, name='gifted-metrics', daemon=True)
+                self._thread.start()
+
+    def run(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error(f'Could not write metrics to {self._path}. {e}')
+
+    def flush(self):
+        if self._path is None:
+            return
+        self._dirty.clear()
+        self.write(os.path.basename(self._path), super().collect())
+
+    def collect(self):
+        self.flush()
+        return self.add_up(name for name in self.files() if not name.startswith('tmp'))
+
+    def files(self):
+        return os.listdir(self.root) if os.path.isdir(self.root) else []
+
+    def add_up(self, names):
+        totals = {}
+        for name in names:
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for sample_name, labels, value in samples:
+                key = (sample_name, tuple(tuple(label) for label in labels))
+                if isinstance(value, list):
+                    total = totals.setdefault(key, [0] * len(value))
+                    totals[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def write(self, name, values):
+        os.makedirs(self.root, exist_ok=True)
+        # write to a temp file first so a concurrent scrape never reads a partially written file
+        fd, tmp = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, 'w') as f:
+            json.dump([[sample_name, labels, value] for (sample_name, labels), value in values.items()], f)
+        os.replace(tmp, os.path.join(self.root, name))
+
+    def reset(self):
+        for name in self.files():
+            os.remove(os.path.join(self.root, name))
+
+    def mark_process_dead(self, pid):
+        dead = [name for name in self.files() if name.startswith(f'{pid}-')]
+        if not dead:
+            return
+        self.write(self.ARCHIVE, self.add_up([self.ARCHIVE] + dead))
+        for name in dead:
+            os.remove(os.path.join(self.root, name))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def record_requests(app, metrics):
+    def before_request():
+        g.metrics_started = time.perf_counter()
+
+    def after_request(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            metrics.observe('gifted_request_duration_seconds', time.perf_counter() - started,
+                            endpoint=request.endpoint or 'unmatched', method=request.method,
+                            status=str(response.status_code))
+        return response
+
+    app.before_request(before_request)
+    app.after_request(after_request)
+
+
+def record_queries(db, metrics):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'other'
+            metrics.observe('gifted_db_query_duration_seconds', time.perf_counter() - started,
+                            operation=operation if operation in ('select', 'insert', 'update', 'delete') else 'other')
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def add_endpoint(app, metrics):
+    token = app.config.get('METRICS_TOKEN')
+    expected = f'Bearer {token}'.encode() if token else None
+    allowed = {address.strip() for address in (app.config.get('METRICS_ALLOWED_IPS') or '').split(',')}
+
+    def view():
+        # scrapes from an allowed address need nothing else; anyone else needs the token, if one is set at all
+        given = request.headers.get('Authorization', '').encode()
+        authorized = request.remote_addr in allowed or expected is not None and hmac.compare_digest(given, expected)
+        if not authorized:
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    # scrapers usually talk plain http to the worker, so let this one view skip the https redirect
+    view.talisman_view_options = {'force_https': False}
+    app.add_url_rule('/metrics', 'metrics', view)
+
+
+backends = {
+    'memory': lambda app: Metrics(),
+    'directory': lambda app: DirectoryMetrics(app.config['METRICS_PATH'],
+                                              flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', 5),
+                                              logger=app.logger),
+}
+
+
+def create_metrics(app, db):
+    metrics = backends[app.config.get('METRICS_BACKEND', 'memory')](app)
+    record_requests(app, metrics)
+    with app.app_context():
+        record_queries(db, metrics)
+    add_endpoint(app, metrics)
+    return metrics
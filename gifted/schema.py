@@ -0,0 +1,44 @@
+import os
+
+from sqlalchemy.exc import DatabaseError
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+class SchemaOutOfDate(Exception):
+    pass
+
+
+def head_revisions(directory=MIGRATIONS_PATH):
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory(directory).get_heads())
+
+
+def applied_revisions(db):
+    try:
+        return {row.version_num for row in db.session.execute('SELECT version_num FROM alembic_version')}
+    except DatabaseError:
+        # no alembic_version table, so nothing has ever been applied
+        db.session.rollback()
+        return set()
+
+
+def check_schema(app, db, mode='warn'):
+    """
+    A cheap probe for boot: one query and a read of the migration scripts, instead of running `flask db upgrade` in
+    every process. Migrations are applied by the release step; this only notices when that has not happened.
+    """
+    if mode == 'off':
+        return True
+    with app.app_context():
+        applied, heads = applied_revisions(db), head_revisions()
+        db.session.remove()
+    if applied == heads:
+        return True
+    message = f'Database is at {", ".join(sorted(applied)) or "no revision"} but the code expects ' \
+              f'{", ".join(sorted(heads))}; run `flask db upgrade`'
+    if mode == 'fail':
+        raise SchemaOutOfDate(message)
+    app.logger.error(message)
+    return False
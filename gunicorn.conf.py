@@ -0,0 +1,24 @@
+import os
+
+bind = f'0.0.0.0:{os.environ.get("PORT", "8000")}'
+workers = int(os.environ.get('WEB_CONCURRENCY') or 2)
+# import the app once in the master and fork it, instead of importing it again in every worker
+preload_app = True
+
+
+def when_ready(server):
+    from gifted import app, db, metrics
+    from gifted.schema import check_schema
+
+    # a fresh set of workers starts counting from zero, like a single process would
+    metrics.reset()
+    check_schema(app, db, mode=app.config['SCHEMA_CHECK'])
+    # the workers are about to be forked, and they must not share the master's database connections
+    db.engine.dispose()
+
+
+def child_exit(server, worker):
+    from gifted import metrics
+
+    # fold the worker's samples into the archive so the metrics directory doesn't grow with every restart
+    metrics.mark_process_dead(worker.pid)
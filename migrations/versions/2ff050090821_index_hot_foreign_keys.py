@@ -0,0 +1,117 @@
+"""index hot foreign keys
+
+Revision ID: 2ff050090821
+Revises: 00abb0fc61a4
+Create Date: 2026-10-18 16:05:58.475708
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2ff050090821'
+down_revision = '00abb0fc61a4'
+branch_labels = None
+depends_on = None
+
+association_tables = ['event_user', 'event_admin', 'event_child']
+
+
+def dedupe_association(name):
+    # the association tables never had a key, so the same membership may have been added more than once
+    table = sa.table(name, sa.column('event_id', sa.Integer), sa.column('user_id', sa.Integer))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select([table.c.event_id, table.c.user_id])
+                              .where(table.c.event_id.isnot(None))
+                              .where(table.c.user_id.isnot(None))
+                              .distinct()).fetchall()
+    connection.execute(table.delete())
+    if rows:
+        connection.execute(table.insert(), [dict(event_id=row.event_id, user_id=row.user_id) for row in rows])
+
+
+def dedupe_pairs():
+    # keep the first pair drawn for each gifter in an event
+    pair = sa.table('pair', sa.column('id', sa.Integer), sa.column('event_id', sa.Integer),
+                    sa.column('gifter_id', sa.Integer))
+    keep = sa.select([sa.func.min(pair.c.id)]).group_by(pair.c.event_id, pair.c.gifter_id)
+    op.get_bind().execute(pair.delete().where(pair.c.id.notin_(keep)))
+
+
+def upgrade():
+    for name in association_tables:
+        dedupe_association(name)
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.alter_column('event_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_primary_key(f'pk_{name}', ['event_id', 'user_id'])
+            batch_op.create_index(f'ix_{name}_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('invite', schema=None) as batch_op:
+        batch_op.create_index('ix_invite_email_code', ['email', 'code'], unique=False)
+        batch_op.create_index('ix_invite_event_id', ['event_id'], unique=False)
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.create_index('ix_item_event_id_user_id', ['event_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.create_index('ix_outbound_email_status_next_attempt_on', ['status', 'next_attempt_on'], unique=False)
+
+    dedupe_pairs()
+    with op.batch_alter_table('pair', schema=None) as batch_op:
+        batch_op.create_index('ix_pair_event_id_gifter_id', ['event_id', 'gifter_id'], unique=True)
+
+    with op.batch_alter_table('pair_exclusion', schema=None) as batch_op:
+        batch_op.create_index('ix_pair_exclusion_event_id_user_id', ['event_id', 'user_id'], unique=False)
+
+    with op.batch_alter_table('reset', schema=None) as batch_op:
+        batch_op.create_index('ix_reset_user_id_code', ['user_id', 'code'], unique=False)
+
+    with op.batch_alter_table('site_admin', schema=None) as batch_op:
+        batch_op.create_index('ix_site_admin_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_event_id_gifter_id', ['event_id', 'gifter_id'], unique=False)
+        batch_op.create_index('ix_transaction_item_id', ['item_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_parent_id', ['parent_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_parent_id')
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_item_id')
+        batch_op.drop_index('ix_transaction_event_id_gifter_id')
+
+    with op.batch_alter_table('site_admin', schema=None) as batch_op:
+        batch_op.drop_index('ix_site_admin_user_id')
+
+    with op.batch_alter_table('reset', schema=None) as batch_op:
+        batch_op.drop_index('ix_reset_user_id_code')
+
+    with op.batch_alter_table('pair_exclusion', schema=None) as batch_op:
+        batch_op.drop_index('ix_pair_exclusion_event_id_user_id')
+
+    with op.batch_alter_table('pair', schema=None) as batch_op:
+        batch_op.drop_index('ix_pair_event_id_gifter_id')
+
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbound_email_status_next_attempt_on')
+
+    with op.batch_alter_table('item', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_event_id_user_id')
+
+    with op.batch_alter_table('invite', schema=None) as batch_op:
+        batch_op.drop_index('ix_invite_event_id')
+        batch_op.drop_index('ix_invite_email_code')
+
+    for name in reversed(association_tables):
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{name}_user_id')
+            batch_op.drop_constraint(f'pk_{name}', type_='primary')
+            batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+            batch_op.alter_column('event_id', existing_type=sa.Integer(), nullable=True)
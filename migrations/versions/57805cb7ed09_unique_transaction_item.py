@@ -0,0 +1,92 @@
+"""unique transaction item
+
+Revision ID: 57805cb7ed09
+Revises: c045b17050fa
+Create Date: 2026-10-18 16:26:09.978949
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '57805cb7ed09'
+down_revision = 'c045b17050fa'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.env')
+
+
+def dedupe_claims():
+    # racing claims may have left several transactions for one item; the first claim wins
+    transaction = sa.table('transaction', sa.column('id', sa.Integer), sa.column('item_id', sa.Integer))
+    keep = sa.select([sa.func.min(transaction.c.id)]).group_by(transaction.c.item_id)
+    result = op.get_bind().execute(transaction.delete().where(transaction.c.item_id.isnot(None))
+                                   .where(transaction.c.id.notin_(keep)))
+    return result.rowcount
+
+
+def rebuild_summaries():
+    # the wishlist summaries counted every duplicate, so recompute them all as WishlistSummary.rebuild does
+    item = sa.table('item', sa.column('id', sa.Integer), sa.column('event_id', sa.Integer),
+                    sa.column('user_id', sa.Integer), sa.column('price', sa.Numeric))
+    transaction = sa.table('transaction', sa.column('id', sa.Integer), sa.column('item_id', sa.Integer),
+                           sa.column('gifter_id', sa.Integer))
+    summary = sa.table('wishlist_summary', sa.column('event_id', sa.Integer), sa.column('user_id', sa.Integer),
+                       sa.column('wishlist_total', sa.Numeric), sa.column('claimed_total', sa.Numeric),
+                       sa.column('liability', sa.Numeric), sa.column('item_count', sa.Integer),
+                       sa.column('claimed_count', sa.Integer))
+    event = sa.table('event', sa.column('generation', sa.Integer))
+    claimed = transaction.c.id.isnot(None)
+    wishlists = sa.select([item.c.event_id, item.c.user_id,
+                           sa.func.sum(item.c.price).label('wishlist_total'),
+                           sa.func.sum(sa.case([(claimed, item.c.price)], else_=0)).label('claimed_total'),
+                           sa.literal(0).label('liability'),
+                           sa.func.count(item.c.id).label('item_count'),
+                           sa.func.sum(sa.case([(claimed, 1)], else_=0)).label('claimed_count')]) \
+        .select_from(item.outerjoin(transaction, transaction.c.item_id == item.c.id)) \
+        .where(item.c.event_id.isnot(None)).where(item.c.user_id.isnot(None)) \
+        .group_by(item.c.event_id, item.c.user_id)
+    liabilities = sa.select([item.c.event_id, transaction.c.gifter_id.label('user_id'),
+                             sa.literal(0).label('wishlist_total'), sa.literal(0).label('claimed_total'),
+                             sa.func.sum(item.c.price).label('liability'),
+                             sa.literal(0).label('item_count'), sa.literal(0).label('claimed_count')]) \
+        .select_from(item.join(transaction, transaction.c.item_id == item.c.id)) \
+        .where(item.c.event_id.isnot(None)).where(transaction.c.gifter_id.isnot(None)) \
+        .group_by(item.c.event_id, transaction.c.gifter_id)
+    counters = sa.union_all(wishlists, liabilities).alias('counters')
+    names = ['wishlist_total', 'claimed_total', 'liability', 'item_count', 'claimed_count']
+
+    connection = op.get_bind()
+    connection.execute(summary.delete())
+    connection.execute(summary.insert().from_select(
+        ['event_id', 'user_id'] + names,
+        sa.select([counters.c.event_id, counters.c.user_id] + [sa.func.sum(counters.c[name]) for name in names])
+        .group_by(counters.c.event_id, counters.c.user_id)))
+    # pages cached per event generation still show the old totals
+    connection.execute(event.update().values(generation=event.c.generation + 1))
+
+
+def upgrade():
+    removed = dedupe_claims()
+    if removed:
+        logger.info(f'Removed {removed} duplicate claims; rebuilding the wishlist summaries')
+        rebuild_summaries()
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_item_id')
+        batch_op.create_index('ix_transaction_item_id', ['item_id'], unique=True)
+
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_item_id')
+        batch_op.create_index('ix_transaction_item_id', ['item_id'], unique=False)
+
+    # ### end Alembic commands ###
@@ -0,0 +1,76 @@
+"""wishlist summary
+
+Revision ID: cfe9bbff0168
+Revises: c1faf2f039a5
+Create Date: 2026-10-18 16:05:17.302964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cfe9bbff0168'
+down_revision = 'c1faf2f039a5'
+branch_labels = None
+depends_on = None
+
+
+def backfill():
+    # the same per-participant counters as WishlistSummary.compute, written by one grouped INSERT ... SELECT so that
+    # existing events start from their real totals rather than from zero
+    item = sa.table('item', sa.column('id', sa.Integer), sa.column('event_id', sa.Integer),
+                    sa.column('user_id', sa.Integer), sa.column('price', sa.Numeric))
+    transaction = sa.table('transaction', sa.column('id', sa.Integer), sa.column('item_id', sa.Integer),
+                           sa.column('gifter_id', sa.Integer))
+    summary = sa.table('wishlist_summary', sa.column('event_id', sa.Integer), sa.column('user_id', sa.Integer),
+                       sa.column('wishlist_total', sa.Numeric), sa.column('claimed_total', sa.Numeric),
+                       sa.column('liability', sa.Numeric), sa.column('item_count', sa.Integer),
+                       sa.column('claimed_count', sa.Integer))
+    claimed = transaction.c.id.isnot(None)
+    wishlists = sa.select([item.c.event_id, item.c.user_id,
+                           sa.func.sum(item.c.price).label('wishlist_total'),
+                           sa.func.sum(sa.case([(claimed, item.c.price)], else_=0)).label('claimed_total'),
+                           sa.literal(0).label('liability'),
+                           sa.func.count(item.c.id).label('item_count'),
+                           sa.func.sum(sa.case([(claimed, 1)], else_=0)).label('claimed_count')]) \
+        .select_from(item.outerjoin(transaction, transaction.c.item_id == item.c.id)) \
+        .where(item.c.event_id.isnot(None)).where(item.c.user_id.isnot(None)) \
+        .group_by(item.c.event_id, item.c.user_id)
+    liabilities = sa.select([item.c.event_id, transaction.c.gifter_id.label('user_id'),
+                             sa.literal(0).label('wishlist_total'), sa.literal(0).label('claimed_total'),
+                             sa.func.sum(item.c.price).label('liability'),
+                             sa.literal(0).label('item_count'), sa.literal(0).label('claimed_count')]) \
+        .select_from(item.join(transaction, transaction.c.item_id == item.c.id)) \
+        .where(item.c.event_id.isnot(None)).where(transaction.c.gifter_id.isnot(None)) \
+        .group_by(item.c.event_id, transaction.c.gifter_id)
+    counters = sa.union_all(wishlists, liabilities).alias('counters')
+    names = ['wishlist_total', 'claimed_total', 'liability', 'item_count', 'claimed_count']
+    op.get_bind().execute(summary.insert().from_select(
+        ['event_id', 'user_id'] + names,
+        sa.select([counters.c.event_id, counters.c.user_id] + [sa.func.sum(counters.c[name]) for name in names])
+        .group_by(counters.c.event_id, counters.c.user_id)))
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('wishlist_summary',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('wishlist_total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('claimed_total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('liability', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('claimed_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('event_id', 'user_id')
+    )
+    # ### end Alembic commands ###
+    backfill()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('wishlist_summary')
+    # ### end Alembic commands ###
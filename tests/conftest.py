@@ -0,0 +1,143 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# the app is built from the environment when gifted is imported, so it must point at a throwaway database first
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'gifted-test.sqlite')
+for key, value in [('FLASK_KEY', 'test'), ('FLASK_MAIL_USER', 'test'), ('FLASK_MAIL_PASSWORD', ''),
+                   ('FLASK_LOG_TO_STDOUT', '1'), ('BLOB_STORE_BACKEND', 'memory'), ('IMAGE_INGEST_BACKEND', 'inline'),
+                   ('FRAGMENT_CACHE_BACKEND', 'null'), ('METRICS_BACKEND', 'memory')]:
+    os.environ.setdefault(key, value)
+
+BASE_URL = 'https://localhost'
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def app():
+    from gifted import app, db
+
+    app.extensions['mail'].suppress = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def context(app):
+    """An app context for tests that use the models directly. Requests push their own, so never hold one across them."""
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def db(app):
+    from gifted import db
+
+    return db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def password_hash():
+    from werkzeug import security
+
+    # hashing is deliberately slow, so every test user shares one
+    return security.generate_password_hash(PASSWORD)
+
+
+class Statements(object):
+    """Records the SQL of every statement the engine sends while it is active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sql = []
+
+    def __enter__(self):
+        from sqlalchemy import event
+
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def __len__(self):
+        return len(self.sql)
+
+    def record(self, connection, cursor, statement, parameters, context, executemany):
+        self.sql.append(statement)
+
+
+@pytest.fixture
+def statements(db):
+    return lambda: Statements(db.engine)
+
+
+@pytest.fixture
+def make_event(app, db, password_hash):
+    """
+    Builds an event with `participants` members, each with `items` wishlist items, every other one claimed by the
+    next participant, and their wishlist summaries. Returns (event id, [user ids]); the first user administers it.
+    """
+    from gifted.models import User, Event, Item, Transaction, WishlistSummary
+
+    events = []
+
+    def make(participants=3, items=2, claimed=True):
+        with app.app_context():
+            return build(participants, items, claimed)
+
+    def build(participants, items, claimed):
+        number = len(events)
+        now = datetime.now()
+        event = Event(title=f'Event {number}', description='Test event', starts_on=now - timedelta(days=1),
+                      ends_on=now + timedelta(days=30))
+        users = [User(username=f'e{number}u{i}@test', password=password_hash, first_name=f'First{i}',
+                      last_name=f'Last{i}') for i in range(participants)]
+        db.session.add(event)
+        db.session.add_all(users)
+        db.session.flush()
+        event.add_members(users)
+        event.add_members(users[:1], as_admin=True)
+
+        for position, user in enumerate(users):
+            for i in range(items):
+                item = Item(event_id=event.id, user_id=user.id, description=f'thing {i}', price=10 + i,
+                            priority='medium', image=b'not a real png')
+                db.session.add(item)
+                db.session.flush()
+                if claimed and i % 2 == 0 and participants > 1:
+                    gifter = users[(position + 1) % participants]
+                    db.session.add(Transaction(event_id=event.id, item_id=item.id, gifter_id=gifter.id,
+                                               giftee_id=user.id, transacted_on=now))
+        db.session.commit()
+        WishlistSummary.rebuild(event.id)
+        events.append(event.id)
+        return event.id, [user.id for user in users]
+
+    return make
+
+
+@pytest.fixture
+def login(app, client):
+    def log_in(user_id):
+        from gifted.models import User
+
+        with app.app_context():
+            username = User.query.get(user_id).username
+        response = client.post(BASE_URL + '/login', data={'username': username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+
+    return log_in
@@ -0,0 +1,41 @@
+import re
+from datetime import datetime, timedelta
+from urllib.parse import unquote
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.admin.routes import EVENT_PAGE_SIZE
+from gifted.models import Event, User
+
+NEXT_PAGE = re.compile(r'href="([^"]*cursor=[^"]*)"')
+EVENT_LINK = re.compile(r'href="/admin/events/(\d+)"')
+
+
+def test_pages_cover_every_event_once_including_undated_ones(app, make_event, login):
+    _, (user_id,) = make_event(participants=1, items=0)
+    with app.app_context():
+        user = User.query.get(user_id)
+        now = datetime.now()
+        for i in range(EVENT_PAGE_SIZE * 2):
+            # every third event has no start date, and a few share one
+            starts_on = None if i % 3 == 0 else now - timedelta(days=i // 2)
+            event = Event(title=f'Event {i}', starts_on=starts_on, ends_on=now)
+            db.session.add(event)
+            db.session.flush()
+            event.add_members([user], as_admin=True)
+        db.session.commit()
+        expected = [event.id for event in Event.query.order_by(Event.starts_on.is_(None), Event.starts_on.desc(),
+                                                               Event.id.desc())]
+    client = login(user_id)
+
+    seen = []
+    url = f'{BASE_URL}/admin/events'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.data.decode()
+        seen.extend(int(event_id) for event_id in dict.fromkeys(EVENT_LINK.findall(page)))
+        next_page = NEXT_PAGE.search(page)
+        url = BASE_URL + unquote(next_page.group(1)).replace('&amp;', '&') if next_page else None
+
+    assert seen == expected
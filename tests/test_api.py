@@ -0,0 +1,99 @@
+import pytest
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.api import routes
+from gifted.models import Item, User
+
+
+def items_url(event_id, user_id, **args):
+    query = '&'.join(f'{name}={value}' for name, value in args.items())
+    return f'{BASE_URL}/api/v1/events/{event_id}/wishlists/{user_id}/items' + (f'?{query}' if query else '')
+
+
+def item_ids(app, event_id, user_id):
+    with app.app_context():
+        return [item.id for item in Item.query.filter_by(event_id=event_id, user_id=user_id).order_by(Item.id.desc())]
+
+
+def test_cursors_walk_every_item_newest_first(app, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=7)
+    client = login(user_ids[1])
+
+    pages = []
+    cursor = None
+    while True:
+        args = {'limit': 3, **({'cursor': cursor} if cursor is not None else {})}
+        payload = client.get(items_url(event_id, user_ids[0], **args)).get_json()
+        pages.append([item['id'] for item in payload['items']])
+        cursor = payload['next_cursor']
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == item_ids(app, event_id, user_ids[0])
+
+
+def test_limit_is_capped(make_event, login, monkeypatch):
+    monkeypatch.setattr(routes, 'MAX_LIMIT', 5)
+    event_id, user_ids = make_event(participants=2, items=7)
+
+    payload = login(user_ids[1]).get(items_url(event_id, user_ids[0], limit=100)).get_json()
+
+    assert len(payload['items']) == 5 and payload['next_cursor'] is not None
+
+
+@pytest.mark.parametrize('args', [{'limit': 0}, {'limit': -1}, {'limit': 'many'}, {'cursor': 'abc'}])
+def test_bad_page_arguments_are_400(make_event, login, args):
+    event_id, user_ids = make_event(participants=2, items=1)
+
+    response = login(user_ids[1]).get(items_url(event_id, user_ids[0], **args))
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Bad Request'
+
+
+def test_fields_pick_what_is_returned_and_always_include_the_id(make_event, login):
+    event_id, user_ids = make_event(participants=2, items=2)
+    client = login(user_ids[1])
+
+    payload = client.get(items_url(event_id, user_ids[0], fields='price,description')).get_json()
+    assert [sorted(item) for item in payload['items']] == [['description', 'id', 'price']] * 2
+
+    response = client.get(items_url(event_id, user_ids[0], fields='price,secret'))
+    assert response.status_code == 400
+    assert 'secret' in response.get_json()['message']
+
+
+def test_etags_hold_until_a_claim_changes_the_event(app, make_event, login):
+    event_id, user_ids = make_event(participants=3, items=1, claimed=False)
+    url = items_url(event_id, user_ids[0], fields='claimed')
+    client = login(user_ids[1])
+    first = client.get(url)
+    etag = first.headers['ETag']
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    item_id = item_ids(app, event_id, user_ids[0])[0]
+    login(user_ids[2]).post(f'{BASE_URL}/events/{event_id}/wishlists/{user_ids[0]}/transactions',
+                            data={'item_id': item_id})
+    client = login(user_ids[1])
+    second = client.get(url, headers={'If-None-Match': etag})
+
+    assert second.status_code == 200 and second.headers['ETag'] != etag
+    assert first.get_json()['items'][0]['claimed'] is False
+    assert second.get_json()['items'][0]['claimed'] is True
+
+
+def test_claims_are_hidden_from_the_owner_and_their_parent(app, make_event, login):
+    event_id, user_ids = make_event(participants=3, items=2)
+    with app.app_context():
+        User.query.get(user_ids[0]).parent_id = user_ids[1]
+        db.session.commit()
+    url = items_url(event_id, user_ids[0], fields='claimed')
+
+    for viewer_id in user_ids[:2]:
+        payload = login(viewer_id).get(url).get_json()
+        assert payload['items'] and all('claimed' not in item for item in payload['items'])
+    payload = login(user_ids[2]).get(url).get_json()
+    assert sorted(item['claimed'] for item in payload['items']) == [False, True]
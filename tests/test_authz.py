@@ -0,0 +1,73 @@
+import re
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.models import Event, SiteAdmin
+
+# the EXISTS query behind has_role, as opposed to anything else the pages read from the membership tables
+ROLE_CHECK = re.compile(r'EXISTS \(SELECT \*\s+FROM (event_user|event_admin)\s', re.IGNORECASE)
+
+
+def role_checks(sql):
+    return [statement for statement in sql if ROLE_CHECK.search(statement)]
+
+
+def test_non_members_get_401_and_missing_events_404(make_event, login):
+    event_id, _ = make_event(participants=2, items=0)
+    _, outsider_ids = make_event(participants=1, items=0)
+    client = login(outsider_ids[0])
+
+    assert client.get(f'{BASE_URL}/events/{event_id}').status_code == 401
+    assert client.get(f'{BASE_URL}/admin/events/{event_id}').status_code == 401
+    assert client.get(f'{BASE_URL}/events/999999').status_code == 404
+    assert client.get(f'{BASE_URL}/events/not-a-number').status_code == 404
+
+
+def test_members_are_not_event_admins(make_event, login):
+    event_id, user_ids = make_event(participants=2, items=0)
+
+    assert login(user_ids[1]).get(f'{BASE_URL}/admin/events/{event_id}').status_code == 401
+    assert login(user_ids[0]).get(f'{BASE_URL}/admin/events/{event_id}').status_code == 200
+
+
+def test_site_admins_manage_every_event(app, make_event, login):
+    event_id, _ = make_event(participants=2, items=0)
+    _, outsider_ids = make_event(participants=1, items=0)
+    with app.app_context():
+        db.session.add(SiteAdmin(user_id=outsider_ids[0]))
+        db.session.commit()
+
+    assert login(outsider_ids[0]).get(f'{BASE_URL}/admin/events/{event_id}').status_code == 200
+
+
+def test_session_grants_last_until_the_generation_changes(app, make_event, login, statements):
+    event_id, user_ids = make_event(participants=3, items=0)
+    client = login(user_ids[1])
+    url = f'{BASE_URL}/events/{event_id}'
+
+    with statements() as first:
+        assert client.get(url).status_code == 200
+    with statements() as second:
+        assert client.get(url).status_code == 200
+    assert len(role_checks(first.sql)) == 1
+    assert role_checks(second.sql) == []
+
+    with app.app_context():
+        Event.query.get(event_id).remove_member(user_ids[1])
+        db.session.commit()
+
+    # the removal bumped the generation, so the cached grant no longer applies
+    with statements() as third:
+        assert client.get(url).status_code == 401
+    assert len(role_checks(third.sql)) == 1
+
+
+def test_grants_are_not_cached_when_the_session_cache_is_off(app, make_event, login, statements, monkeypatch):
+    monkeypatch.setitem(app.config, 'SESSION_AUTHZ_CACHE', False)
+    event_id, user_ids = make_event(participants=2, items=0)
+    client = login(user_ids[1])
+
+    for _ in range(2):
+        with statements() as recorded:
+            assert client.get(f'{BASE_URL}/events/{event_id}').status_code == 200
+        assert len(role_checks(recorded.sql)) == 1
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.models import Item, Transaction, User, WishlistSummary
+
+THREADS = 16
+
+
+def test_concurrent_claims_for_one_item_have_one_winner(app, make_event):
+    event_id, user_ids = make_event(participants=THREADS + 1, items=1, claimed=False)
+    with app.app_context():
+        item_id = Item.query.filter_by(event_id=event_id, user_id=user_ids[0]).one().id
+    barrier = threading.Barrier(THREADS)
+
+    def claim(gifter_id):
+        # every thread has its own app context, and so its own session and connection
+        with app.app_context():
+            item = Item.query.get(item_id)
+            barrier.wait()
+            claimed = Transaction.claim(item, gifter_id)
+            db.session.commit()
+            return claimed
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(claim, user_ids[1:]))
+
+    assert results.count(True) == 1
+    with app.app_context():
+        transactions = Transaction.query.filter_by(item_id=item_id).all()
+        assert len(transactions) == 1
+        assert transactions[0].gifter_id == user_ids[1:][results.index(True)]
+        assert WishlistSummary.verify(event_id) == []
+
+
+def test_unclaim_only_deletes_the_gifters_own_claim(app, make_event):
+    event_id, user_ids = make_event(participants=3, items=1, claimed=False)
+    with app.app_context():
+        item = Item.query.filter_by(event_id=event_id, user_id=user_ids[0]).one()
+        assert Transaction.claim(item, user_ids[1])
+        db.session.commit()
+        transaction_id = Transaction.query.filter_by(item_id=item.id).one().id
+
+        assert Transaction.unclaim(transaction_id, user_ids[2]) is None
+        assert Transaction.unclaim(transaction_id, user_ids[1]).id == item.id
+        assert Transaction.unclaim(transaction_id, user_ids[1]) is None
+        db.session.commit()
+
+        assert Transaction.query.count() == 0
+        assert WishlistSummary.verify(event_id) == []
+
+
+def claim(client, event_id, item):
+    return client.post(f'{BASE_URL}/events/{event_id}/wishlists/{item[1]}/transactions', data={'item_id': item[0]})
+
+
+def first_items(app, event_id):
+    with app.app_context():
+        return {item.user_id: (item.id, item.user_id) for item in Item.query.filter_by(event_id=event_id)}
+
+
+def test_nobody_claims_from_their_own_or_their_childs_wishlist(app, make_event, login):
+    event_id, user_ids = make_event(participants=3, items=1, claimed=False)
+    with app.app_context():
+        User.query.get(user_ids[2]).parent_id = user_ids[1]
+        db.session.commit()
+    items = first_items(app, event_id)
+    client = login(user_ids[1])
+
+    for owner_id in user_ids[1:]:
+        assert claim(client, event_id, items[owner_id]).status_code == 302
+    with app.app_context():
+        assert Transaction.query.count() == 0
+        assert WishlistSummary.verify(event_id) == []
+
+    claim(client, event_id, items[user_ids[0]])
+    with app.app_context():
+        assert Transaction.query.one().gifter_id == user_ids[1]
+
+
+def test_only_members_claim_or_unclaim(app, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=1, claimed=False)
+    _, outsider_ids = make_event(participants=1, items=0)
+    items = first_items(app, event_id)
+    with app.app_context():
+        item = Item.query.get(items[user_ids[0]][0])
+        assert Transaction.claim(item, user_ids[1])
+        db.session.commit()
+        transaction_id = Transaction.query.one().id
+    client = login(outsider_ids[0])
+
+    assert claim(client, event_id, items[user_ids[1]]).status_code == 401
+    response = client.post(f'{BASE_URL}/events/{event_id}/wishlists/{user_ids[1]}/transactions/'
+                           f'{transaction_id}/delete')
+    assert response.status_code == 401
+    with app.app_context():
+        assert [transaction.id for transaction in Transaction.query] == [transaction_id]
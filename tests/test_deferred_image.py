@@ -0,0 +1,49 @@
+import re
+
+import pytest
+from sqlalchemy.orm import undefer
+
+from conftest import BASE_URL
+from gifted.models import Item, WishlistSummary
+
+# how the ORM selects the thumbnail column itself, as opposed to the `item.image IS NOT NULL` behind has_image
+SELECTS_IMAGE = re.compile(r'\bitem\.image AS ')
+
+
+def selects_image(sql):
+    return [statement for statement in sql if SELECTS_IMAGE.search(re.split(r'\sFROM\s', statement, 1)[0])]
+
+
+def test_selects_image_recognizes_a_full_item_load(context, make_event, statements):
+    event_id, _ = make_event()
+    with statements() as recorded:
+        Item.query.options(undefer('image')).filter_by(event_id=event_id).all()
+
+    assert selects_image(recorded.sql)
+
+
+@pytest.mark.parametrize('path', [
+    '/events/{event_id}',
+    '/events/{event_id}/wishlists/{user_id}',
+    '/events/{event_id}/purchases/{user_id}',
+    '/api/v1/events/{event_id}/progress',
+    '/api/v1/events/{event_id}/wishlists/{user_id}/items',
+])
+def test_pages_never_select_thumbnails(make_event, login, statements, path):
+    event_id, user_ids = make_event(participants=3, items=2)
+    client = login(user_ids[0])
+
+    with statements() as recorded:
+        response = client.get(BASE_URL + path.format(event_id=event_id, user_id=user_ids[1]))
+
+    assert response.status_code == 200
+    assert selects_image(recorded.sql) == []
+
+
+def test_summary_aggregates_never_select_thumbnails(context, make_event, statements):
+    event_id, _ = make_event(participants=3, items=2)
+
+    with statements() as recorded:
+        WishlistSummary.compute(event_id)
+
+    assert recorded.sql and selects_image(recorded.sql) == []
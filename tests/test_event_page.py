@@ -0,0 +1,67 @@
+from conftest import BASE_URL
+from gifted.fragments import MemoryFragmentCache
+from gifted.main import routes
+from gifted.models import Item
+
+# the viewer, the event and their membership in it; the participants, their summaries and the parents among them;
+# the viewer's pair and liability
+EVENT_PAGE_BUDGET = 8
+COMPLETE = 'wishlist is complete!'
+LIABILITY = 'You are on the hook for <strong>${}</strong>'
+
+
+def render_event_page(client, statements, event_id):
+    with statements() as recorded:
+        response = client.get(f'{BASE_URL}/events/{event_id}')
+    assert response.status_code == 200
+    return len(recorded)
+
+
+def test_event_page_stays_within_its_query_budget(make_event, login, statements):
+    small, small_users = make_event(participants=3)
+    large, large_users = make_event(participants=40)
+
+    small_count = render_event_page(login(small_users[0]), statements, small)
+    large_count = render_event_page(login(large_users[0]), statements, large)
+
+    assert small_count == large_count
+    assert large_count <= EVENT_PAGE_BUDGET
+
+
+class RecordingFragmentCache(MemoryFragmentCache):
+    def __init__(self):
+        super().__init__(16)
+        self.rendered = []
+
+    def get_or_render(self, key, ttl, render):
+        def record():
+            self.rendered.append(key)
+            return render()
+        return super().get_or_render(key, ttl, record)
+
+
+def test_claims_invalidate_the_cached_cards_but_liability_is_never_cached(app, make_event, login, monkeypatch):
+    cache = RecordingFragmentCache()
+    monkeypatch.setattr(routes, 'fragment_cache', cache)
+    event_id, user_ids = make_event(participants=3, items=1, claimed=False)
+    with app.app_context():
+        item_id = Item.query.filter_by(event_id=event_id, user_id=user_ids[0]).one().id
+
+    def page(viewer_id):
+        return login(viewer_id).get(f'{BASE_URL}/events/{event_id}').data.decode()
+
+    before = page(user_ids[1])
+    page(user_ids[2])
+    assert len(cache.rendered) == 1
+
+    login(user_ids[1]).post(f'{BASE_URL}/events/{event_id}/wishlists/{user_ids[0]}/transactions',
+                            data={'item_id': item_id})
+    claimer, bystander = page(user_ids[1]), page(user_ids[2])
+
+    # the claim bumped the generation, so the cards were rendered once more and then shared again
+    assert len(cache.rendered) == 2 and cache.rendered[0] != cache.rendered[1]
+    assert before.count(COMPLETE) == 0
+    assert claimer.count(COMPLETE) == bystander.count(COMPLETE) == 1
+    # only the claimer owes anything, even though both pages were built from the same cached cards
+    assert LIABILITY.format('10.00') not in before
+    assert LIABILITY.format('10.00') in claimer and 'Start purchasing!' in bystander
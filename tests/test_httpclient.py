@@ -0,0 +1,55 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from gifted.httpclient import HttpClient
+
+
+@pytest.fixture
+def trickling_server():
+    """Answers every request with headers and then one body byte every 50ms, which never trips a read timeout."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    stop = threading.Event()
+
+    def serve():
+        connection, _ = listener.accept()
+        with connection:
+            connection.recv(4096)
+            connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: close\r\n\r\n')
+            try:
+                while not stop.wait(0.05):
+                    connection.sendall(b'x')
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{listener.getsockname()[1]}/'
+    stop.set()
+    listener.close()
+    thread.join(timeout=5)
+
+
+def test_the_total_timeout_covers_a_trickling_body(trickling_server):
+    client = HttpClient(read_timeout=1, total_timeout=0.5)
+
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.get(trickling_server, max_bytes=1024 * 1024)
+
+    assert time.monotonic() - started < 2
+
+
+def test_host_slots_keep_only_the_most_recently_used_hosts():
+    client = HttpClient(max_hosts=3)
+    first = client.host_slots('a.test')
+    for host in ['b.test', 'c.test', 'a.test', 'd.test']:
+        client.host_slots(host)
+
+    assert list(client._hosts) == ['c.test', 'a.test', 'd.test']
+    assert client.host_slots('a.test') is first
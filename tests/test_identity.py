@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.models import Item, Transaction, User
+
+
+@pytest.fixture
+def snapshots(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'SESSION_IDENTITY_SNAPSHOT', '1')
+
+
+def claim(client, event_id, owner_id, item_id):
+    return client.post(f'{BASE_URL}/events/{event_id}/wishlists/{owner_id}/transactions', data={'item_id': item_id})
+
+
+@pytest.mark.parametrize('change', ['reset password', 'delete account'])
+def test_writes_recheck_the_account_behind_a_snapshot(app, snapshots, make_event, login, change):
+    event_id, user_ids = make_event(participants=2, items=1, claimed=False)
+    client = login(user_ids[1])
+    with app.app_context():
+        item_id = Item.query.filter_by(user_id=user_ids[0]).one().id
+        user = User.query.get(user_ids[1])
+        if change == 'reset password':
+            user.password = 'a different hash'
+        else:
+            db.session.delete(user)
+        db.session.commit()
+
+    response = claim(client, event_id, user_ids[0], item_id)
+
+    assert response.status_code == 302 and response.location.endswith('/login')
+    with app.app_context():
+        assert Transaction.query.count() == 0
+
+
+def test_writes_from_a_current_snapshot_go_through(app, snapshots, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=1, claimed=False)
+    client = login(user_ids[1])
+    with app.app_context():
+        item_id = Item.query.filter_by(user_id=user_ids[0]).one().id
+
+    response = claim(client, event_id, user_ids[0], item_id)
+
+    assert response.status_code == 302 and not response.location.endswith('/login')
+    with app.app_context():
+        assert Transaction.query.one().gifter_id == user_ids[1]
@@ -0,0 +1,56 @@
+import gifted
+from conftest import BASE_URL
+from gifted import db
+from gifted.blobstore import FileSystemBlobStore, content_hash
+from gifted.models import Item
+
+THUMBNAIL = b'not a real png'
+
+
+def migrate(app):
+    result = app.test_cli_runner().invoke(args=['images', 'migrate'])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def stored(app, event_id):
+    with app.app_context():
+        return [(item.image, item.image_hash) for item in
+                Item.query.options(db.undefer('image')).filter_by(event_id=event_id)]
+
+
+def test_migrating_to_a_store_that_is_not_durable_keeps_the_item_table_copy(app, make_event, monkeypatch, tmp_path):
+    monkeypatch.setattr(gifted.commands, 'blob_store', FileSystemBlobStore(str(tmp_path)))
+    event_id, _ = make_event(participants=2, items=1)
+
+    assert 'not durable' in migrate(app)
+
+    assert stored(app, event_id) == [(THUMBNAIL, content_hash(THUMBNAIL))] * 2
+
+
+def test_migrating_to_a_durable_store_moves_thumbnails(app, make_event, monkeypatch, tmp_path):
+    blob_store = FileSystemBlobStore(str(tmp_path))
+    monkeypatch.setattr(gifted.commands, 'blob_store', blob_store)
+    event_id, _ = make_event(participants=2, items=1)
+    migrate(app)
+
+    # once the store is made durable, migrating again finishes the move
+    blob_store.durable = True
+    migrate(app)
+
+    assert stored(app, event_id) == [(None, content_hash(THUMBNAIL))] * 2
+    assert blob_store.get(content_hash(THUMBNAIL)) == THUMBNAIL
+
+
+def test_thumbnails_are_served_from_the_item_table_when_the_blob_is_gone(app, make_event, monkeypatch, tmp_path,
+                                                                        client):
+    monkeypatch.setattr(gifted.commands, 'blob_store', FileSystemBlobStore(str(tmp_path / 'wiped')))
+    event_id, _ = make_event(participants=1, items=1)
+    migrate(app)
+    with app.app_context():
+        item_id = Item.query.filter_by(event_id=event_id).one().id
+
+    # the app's own blob store never saw the blob, like a dyno that restarted since
+    response = client.get(f'{BASE_URL}/items/{item_id}/image')
+
+    assert response.status_code == 200 and response.data == THUMBNAIL
@@ -0,0 +1,29 @@
+import re
+
+import pytest
+
+from gifted import db
+from gifted.models import Item, Transaction, event_user
+
+# the filters the busiest pages run, and the index each of them must be answered from
+HOT_FILTERS = {
+    'ix_transaction_event_id_gifter_id': lambda: Transaction.query.filter_by(event_id=1, gifter_id=1),
+    'ix_transaction_item_id': lambda: Transaction.query.filter_by(item_id=1),
+    'ix_item_event_id_user_id': lambda: Item.query.filter_by(event_id=1, user_id=1),
+    'ix_event_user_user_id': lambda: db.session.query(event_user.c.event_id).filter(event_user.c.user_id == 1),
+    # the composite primary key
+    'sqlite_autoindex_event_user_1':
+        lambda: db.session.query(event_user.c.user_id).filter(event_user.c.event_id == 1),
+}
+
+
+def query_plan(query):
+    statement = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in db.session.execute(f'EXPLAIN QUERY PLAN {statement}')]
+
+
+@pytest.mark.parametrize('index', sorted(HOT_FILTERS))
+def test_hot_filter_uses_its_index(context, index):
+    plan = query_plan(HOT_FILTERS[index]())
+
+    assert any(re.search(rf'USING (COVERING )?INDEX {index}\b', step) for step in plan), plan
@@ -0,0 +1,87 @@
+from gifted import db
+from gifted.blobstore import MemoryBlobStore
+from gifted.helpers import TransientFetchError
+from gifted.ingest import IMAGE_FAILED, IMAGE_READY, InlineIngestor, create_ingestor
+from gifted.metacache import MetadataCache
+from gifted.models import Item
+
+
+def item_with_link(app, event_id):
+    with app.app_context():
+        item = Item.query.filter_by(event_id=event_id).first()
+        item.location = 'https://shop.test/product'
+        db.session.commit()
+        return item.id
+
+
+def test_no_session_is_held_while_fetching(app, make_event):
+    event_id, _ = make_event(participants=2, items=1)
+    item_id = item_with_link(app, event_id)
+    sessions = []
+
+    def fetch_image_url(location):
+        sessions.append(db.session.registry.has())
+        return 'https://shop.test/image.png'
+
+    def fetch_thumbnail(image_url):
+        sessions.append(db.session.registry.has())
+        return b'thumbnail'
+
+    ingestor = InlineIngestor(app, MemoryBlobStore(), fetch_image_url=fetch_image_url, fetch_thumbnail=fetch_thumbnail)
+
+    assert ingestor.submit(item_id) == IMAGE_READY
+    assert sessions == [False, False]
+    with app.app_context():
+        item = Item.query.get(item_id)
+        assert item.image_url == 'https://shop.test/image.png'
+        assert ingestor.blob_store.get(item.image_hash) == b'thumbnail'
+
+
+def test_an_item_deleted_while_fetching_is_skipped(app, make_event):
+    event_id, _ = make_event(participants=2, items=1)
+    item_id = item_with_link(app, event_id)
+
+    def fetch_image_url(location):
+        with app.app_context():
+            db.session.delete(Item.query.get(item_id))
+            db.session.commit()
+        return None
+
+    ingestor = InlineIngestor(app, MemoryBlobStore(), fetch_image_url=fetch_image_url)
+
+    assert ingestor.submit(item_id) is None
+
+
+def test_a_missing_image_marks_the_item_failed(app, make_event):
+    event_id, _ = make_event(participants=2, items=1)
+    item_id = item_with_link(app, event_id)
+
+    ingestor = InlineIngestor(app, MemoryBlobStore(), fetch_image_url=lambda location: None)
+
+    assert ingestor.submit(item_id) == IMAGE_FAILED
+
+
+def test_transient_metadata_failures_are_retried(app, make_event, monkeypatch):
+    event_id, _ = make_event(participants=2, items=1)
+    item_id = item_with_link(app, event_id)
+    outcomes = [TransientFetchError('503 error'), 'https://shop.test/image.png']
+
+    def fetch(url):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setitem(app.config, 'IMAGE_INGEST_BACKOFF', 0)
+    ingestor = create_ingestor(app, MemoryBlobStore(), MetadataCache(app, fetch=fetch))
+    sessions = []
+
+    def fetch_thumbnail(image_url):
+        # the shared cache tier doesn't leave a session behind either
+        sessions.append(db.session.registry.has())
+        return b'thumbnail'
+    ingestor.fetch_thumbnail = fetch_thumbnail
+
+    assert ingestor.submit(item_id) == IMAGE_READY
+    assert outcomes == []
+    assert sessions == [False]
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.models import Invite
+
+
+def bulk_invite(client, event_id, emails):
+    return client.post(f'{BASE_URL}/admin/invites/bulk', data={'eventId': event_id, 'emails': emails})
+
+
+def test_bulk_invites_need_an_event_admin(app, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=0)
+
+    response = bulk_invite(login(user_ids[1]), event_id, 'new@test')
+
+    assert response.status_code == 401
+    with app.app_context():
+        assert Invite.query.count() == 0
+
+
+def test_bulk_invites_compare_addresses_case_insensitively(app, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=0)
+    with app.app_context():
+        db.session.add(Invite(event_id=event_id, invited_by=user_ids[0], email='Pending@Test', code='code',
+                              expires_on=datetime.now() + timedelta(days=7)))
+        db.session.commit()
+
+    response = bulk_invite(login(user_ids[0]), event_id, ' New@Test, new@test\nE0U1@TEST; pending@test ')
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert sorted(invite.email for invite in Invite.query) == ['Pending@Test', 'new@test']
+    for result in [b'listed more than once', b'already has an account', b'already has an open invite']:
+        assert result in response.data
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import BASE_URL
+from gifted import db
+from gifted.models import Event, Pair, PairExclusion
+
+
+def add_exclusion(app, event_id, user_id, excluded_user_id):
+    with app.app_context():
+        exclusion = PairExclusion(event_id=event_id, user_id=user_id, excluded_user_id=excluded_user_id)
+        db.session.add(exclusion)
+        db.session.commit()
+        return exclusion.id
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return session.get('_flashes', [])
+
+
+@pytest.mark.parametrize('path, data', [
+    ('/admin/events/{event_id}/matchmake', lambda user_ids: {'shuffledUsers': user_ids}),
+    ('/admin/events/{event_id}/exclusions', lambda user_ids: {'userId': user_ids[1], 'excludedUserId': user_ids[2]}),
+])
+def test_event_routes_need_an_event_admin(app, make_event, login, path, data):
+    event_id, user_ids = make_event(participants=3, items=0)
+    client = login(user_ids[1])
+
+    response = client.post(BASE_URL + path.format(event_id=event_id), data=data(user_ids))
+
+    assert response.status_code == 401
+    with app.app_context():
+        assert Pair.query.count() == PairExclusion.query.count() == 0
+
+
+def test_removing_an_exclusion_needs_an_event_admin(app, make_event, login):
+    event_id, user_ids = make_event(participants=3, items=0)
+    exclusion_id = add_exclusion(app, event_id, user_ids[1], user_ids[2])
+
+    response = login(user_ids[1]).post(f'{BASE_URL}/admin/exclusions/{exclusion_id}/delete')
+    assert response.status_code == 401
+    response = login(user_ids[0]).post(f'{BASE_URL}/admin/exclusions/{exclusion_id}/delete')
+    assert response.status_code == 302
+    with app.app_context():
+        assert PairExclusion.query.count() == 0
+
+
+def test_removing_an_exclusion_for_every_event_needs_a_site_admin(app, make_event, login):
+    event_id, user_ids = make_event(participants=3, items=0)
+    exclusion_id = add_exclusion(app, None, user_ids[1], user_ids[2])
+
+    response = login(user_ids[0]).post(f'{BASE_URL}/admin/exclusions/{exclusion_id}/delete')
+
+    assert response.status_code == 401
+    with app.app_context():
+        assert PairExclusion.query.count() == 1
+
+
+def test_relaxing_history_says_so(app, make_event, login):
+    event_id, user_ids = make_event(participants=2, items=0)
+    with app.app_context():
+        # with two people, last year's pairs are the only possible ones
+        earlier = Event(title='Last year', starts_on=datetime.now() - timedelta(days=365),
+                        ends_on=datetime.now() - timedelta(days=300))
+        db.session.add(earlier)
+        db.session.flush()
+        db.session.add_all([Pair(event_id=earlier.id, gifter_id=user_ids[0], giftee_id=user_ids[1]),
+                            Pair(event_id=earlier.id, gifter_id=user_ids[1], giftee_id=user_ids[0])])
+        db.session.commit()
+    client = login(user_ids[0])
+
+    response = client.post(f'{BASE_URL}/admin/events/{event_id}/matchmake', data={'shuffledUsers': user_ids})
+
+    assert response.status_code == 302
+    assert flashes(client) == [('warning', "Shuffled users, but could not avoid last time's pairs! "
+                                           'Exclusions were still honoured.')]
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from gifted import db
+from gifted.models import User, Event, event_user, event_admin, event_child
+
+# per membership table one existence check and one multi-row insert, then one generation bump
+ADD_MEMBERS_BUDGET = 3 * 2 + 1
+
+
+def new_users(count, password_hash):
+    parent = User(username='parent@test', password=password_hash, first_name='Parent', last_name='Test')
+    db.session.add(parent)
+    db.session.flush()
+    users = [User(username=f'u{i}@test', password=password_hash, first_name=f'First{i}', last_name='Test',
+                  parent_id=parent.id if i % 3 == 0 else None) for i in range(count)]
+    db.session.add_all(users)
+    db.session.flush()
+    return users
+
+
+def memberships(table, event_id):
+    return db.session.query(table.c.user_id).filter(table.c.event_id == event_id).count()
+
+
+@pytest.mark.parametrize('count', [5, 50])
+def test_add_members_runs_a_bounded_number_of_statements(context, statements, password_hash, count):
+    event = Event(title='Event', starts_on=datetime.now(), ends_on=datetime.now())
+    db.session.add(event)
+    users = new_users(count, password_hash)
+
+    with statements() as recorded:
+        added = event.add_members(users, as_admin=True)
+
+    assert len(recorded) == ADD_MEMBERS_BUDGET
+    assert len(added) == count
+    assert memberships(event_user, event.id) == memberships(event_admin, event.id) == count
+    assert memberships(event_child, event.id) == len([user for user in users if user.parent_id])
+
+
+def test_adding_existing_members_again_changes_nothing(context, statements, password_hash):
+    event = Event(title='Event', starts_on=datetime.now(), ends_on=datetime.now())
+    db.session.add(event)
+    users = new_users(10, password_hash)
+    event.add_members(users)
+    generation = db.session.query(Event.generation).filter_by(id=event.id).scalar()
+
+    with statements() as recorded:
+        added = event.add_members(users)
+
+    # only the existence checks, for event_user and event_child
+    assert len(recorded) == 2
+    assert added == []
+    assert memberships(event_user, event.id) == 10
+    assert db.session.query(Event.generation).filter_by(id=event.id).scalar() == generation
@@ -0,0 +1,72 @@
+import pytest
+import requests
+
+import gifted
+from gifted.helpers import TransientFetchError, get_image_url_from_metadata
+from gifted.httpclient import TooManyRequests
+from gifted.metacache import MetadataCache
+from gifted.models import MetadataLookup
+
+URL = 'https://shop.test/product'
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(f'{status_code} error', response=response)
+
+
+class Fetch(object):
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+
+    def __call__(self, url):
+        self.calls += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+@pytest.mark.parametrize('error', [requests.Timeout('slow'), requests.ConnectionError('refused'),
+                                   TooManyRequests('busy'), http_error(429), http_error(503)])
+def test_transient_failures_are_raised(context, monkeypatch, error):
+    def fail(url):
+        raise error
+    monkeypatch.setattr(gifted.http_client, 'get_html_head', fail)
+
+    with pytest.raises(TransientFetchError):
+        get_image_url_from_metadata(URL)
+
+
+@pytest.mark.parametrize('error', [http_error(404), http_error(410), ValueError('unparseable')])
+def test_definitive_misses_are_none(context, monkeypatch, error):
+    def fail(url):
+        raise error
+    monkeypatch.setattr(gifted.http_client, 'get_html_head', fail)
+
+    assert get_image_url_from_metadata(URL) is None
+
+
+def test_transient_failures_are_not_cached(app, context):
+    fetch = Fetch(TransientFetchError('503 error'))
+    cache = MetadataCache(app, fetch=fetch)
+
+    for _ in range(2):
+        with pytest.raises(TransientFetchError):
+            cache.get_image_url(URL)
+
+    assert fetch.calls == 2
+    assert MetadataLookup.query.count() == 0
+    assert cache.stats()['transient_errors'] == 2
+
+
+def test_definitive_misses_are_cached(app, context):
+    fetch = Fetch(None)
+    cache = MetadataCache(app, fetch=fetch)
+
+    assert cache.get_image_url(URL) is None
+    assert cache.get_image_url(URL) is None
+
+    assert fetch.calls == 1
+    assert MetadataLookup.query.one().image_url is None
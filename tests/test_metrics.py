@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+
+from gifted.prometheus import DirectoryMetrics, Metrics, add_endpoint
+
+COUNTER = 'gifted_image_ingest_total'
+
+
+def scrape(remote_addr, token=None, allowed_ips='127.0.0.1,::1', authorization=None):
+    app = Flask(__name__)
+    app.config.update(METRICS_TOKEN=token, METRICS_ALLOWED_IPS=allowed_ips)
+    add_endpoint(app, Metrics())
+    headers = {'Authorization': authorization} if authorization else {}
+    return app.test_client().get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': remote_addr}).status_code
+
+
+@pytest.mark.parametrize('remote_addr, token, authorization, status', [
+    ('127.0.0.1', None, None, 200),
+    ('10.1.2.3', None, None, 401),
+    ('10.1.2.3', None, 'Bearer ', 401),
+    ('10.1.2.3', 'secret', None, 401),
+    ('10.1.2.3', 'secret', 'Bearer wrong', 401),
+    ('10.1.2.3', 'secret', 'Bearer secret', 200),
+])
+def test_the_endpoint_needs_an_allowed_address_or_the_token(remote_addr, token, authorization, status):
+    assert scrape(remote_addr, token=token, authorization=authorization) == status
+
+
+def test_dead_workers_are_folded_into_the_archive(tmp_path):
+    metrics = DirectoryMetrics(str(tmp_path))
+    metrics.write('101-a.json', {(COUNTER, (('status', 'ready'),)): 2})
+    metrics.write('102-b.json', {(COUNTER, (('status', 'ready'),)): 3})
+    before = metrics.add_up(metrics.files())
+
+    metrics.mark_process_dead(101)
+    metrics.write('103-c.json', {(COUNTER, (('status', 'failed'),)): 1})
+    metrics.mark_process_dead(103)
+
+    assert sorted(metrics.files()) == ['102-b.json', DirectoryMetrics.ARCHIVE]
+    assert metrics.add_up(metrics.files()) == {**before, (COUNTER, (('status', 'failed'),)): 1}
+
+
+def test_reset_empties_the_directory(tmp_path):
+    metrics = DirectoryMetrics(str(tmp_path))
+    metrics.write('101-a.json', {(COUNTER, ()): 2})
+
+    metrics.reset()
+
+    assert metrics.files() == []
@@ -0,0 +1,189 @@
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask_mail import Message
+
+from gifted import db, mail
+from gifted.models import OutboundEmail
+from gifted.outbox import DEAD, QUEUED, SENDING, SENT, MailSender, enqueue_many
+
+BACKOFF = 30
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: refuses recipients containing 'reject' and hangs up when told to."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stub')
+        recipients = []
+        for line in iter(self.rfile.readline, b''):
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == 'MAIL':
+                if server.hang_up_after is not None and len(server.messages) >= server.hang_up_after:
+                    return
+                recipients = []
+                self.reply('250 ok')
+            elif verb == 'RCPT':
+                if 'reject' in command:
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(command.split(':', 1)[1].strip('<> '))
+                    self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                with server.lock:
+                    server.messages.append(recipients)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.hang_up_after = None
+
+
+@pytest.fixture
+def smtp(app, monkeypatch):
+    """Points Flask-Mail at an in-process SMTP server for the duration of the test."""
+    server = SMTPStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state = app.extensions['mail']
+    for name, value in [('server', '127.0.0.1'), ('port', server.server_address[1]), ('use_ssl', False),
+                        ('use_tls', False), ('password', ''), ('suppress', False)]:
+        monkeypatch.setattr(state, name, value)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sender(app):
+    return MailSender(app, mail, batch_size=2, max_attempts=3, backoff=BACKOFF)
+
+
+def queue(app, *recipients):
+    with app.app_context():
+        enqueue_many([Message('Hello', sender='gifted@test', recipients=[recipient], body='Hi')
+                      for recipient in recipients])
+        db.session.commit()
+
+
+def emails(app):
+    with app.app_context():
+        return OutboundEmail.query.order_by(OutboundEmail.id).all()
+
+
+def make_due(app):
+    """Moves every retry into the past, as if the backoff had elapsed."""
+    with app.app_context():
+        OutboundEmail.query.update({'next_attempt_on': datetime.now()})
+        db.session.commit()
+
+
+def test_every_batch_goes_over_one_connection(app, smtp, sender):
+    queue(app, *[f'u{i}@test' for i in range(5)])
+
+    assert sender.flush() == 5
+
+    assert smtp.connections == 1
+    assert smtp.messages == [[f'u{i}@test'] for i in range(5)]
+    assert {email.status for email in emails(app)} == {SENT}
+
+
+def test_failures_back_off_exponentially_and_then_die(app, smtp, sender):
+    queue(app, 'reject@test', 'ok@test')
+
+    delays = []
+    for _ in range(sender.max_attempts):
+        started = datetime.now()
+        sender.flush()
+        rejected = emails(app)[0]
+        if rejected.status == QUEUED:
+            delays.append((rejected.next_attempt_on - started).total_seconds())
+        make_due(app)
+
+    rejected, delivered = emails(app)
+    assert [round(delay) for delay in delays] == [BACKOFF, BACKOFF * 2]
+    assert rejected.status == DEAD and rejected.attempts == sender.max_attempts
+    assert '550' in rejected.last_error
+    assert delivered.status == SENT and delivered.attempts == 0
+    # nothing is left for the sender to claim
+    assert sender.flush() == 0
+
+
+def test_a_dropped_connection_keeps_what_was_sent_and_requeues_the_rest(app, smtp, sender):
+    queue(app, 'a@test', 'b@test', 'c@test', 'd@test')
+    smtp.hang_up_after = 3
+
+    assert sender.flush() == 3
+
+    # the server hung up halfway through the second batch, after taking its first message
+    statuses = [(email.status, email.attempts) for email in emails(app)]
+    assert statuses == [(SENT, 0), (SENT, 0), (SENT, 0), (QUEUED, 1)]
+    assert len(smtp.messages) == 3
+
+    smtp.hang_up_after = None
+    make_due(app)
+    assert sender.flush() == 1
+    assert smtp.connections == 2
+    assert {email.status for email in emails(app)} == {SENT}
+
+
+def test_racing_senders_never_claim_the_same_email(app, sender):
+    queue(app, *[f'u{i}@test' for i in range(20)])
+    senders = [MailSender(app, mail, batch_size=20) for _ in range(2)]
+    assert senders[0].token != senders[1].token
+    barrier = threading.Barrier(len(senders))
+    claimed = {}
+
+    def claim(racer):
+        with app.app_context():
+            barrier.wait()
+            claimed[racer.token] = {email.id for email in racer.claim()}
+
+    threads = [threading.Thread(target=claim, args=(racer,)) for racer in senders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first, second = claimed.values()
+    assert not first & second
+    assert len(first | second) == 20
+    for email in emails(app):
+        assert email.status == SENDING
+        assert claimed[email.claimed_by] >= {email.id}
+
+
+def test_abandoned_claims_are_taken_over(app, sender):
+    queue(app, 'u@test')
+    other = MailSender(app, mail, claim_timeout=600)
+    with app.app_context():
+        assert len(other.claim()) == 1
+        OutboundEmail.query.update({'claimed_on': datetime.now() - timedelta(seconds=601)})
+        db.session.commit()
+
+        assert [email.claimed_by for email in sender.claim()] == [sender.token]
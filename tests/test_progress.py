@@ -0,0 +1,28 @@
+from conftest import BASE_URL
+
+
+def fetch_progress(client, statements, event_id):
+    with statements() as recorded:
+        response = client.get(f'{BASE_URL}/api/v1/events/{event_id}/progress')
+    assert response.status_code == 200
+    return len(recorded), response.get_json()['progress']
+
+
+def test_progress_query_count_does_not_grow_with_participants(make_event, login, statements):
+    small, small_users = make_event(participants=3)
+    large, large_users = make_event(participants=30)
+
+    small_count, small_progress = fetch_progress(login(small_users[0]), statements, small)
+    large_count, large_progress = fetch_progress(login(large_users[0]), statements, large)
+
+    assert len(small_progress) == 2 and len(large_progress) == 29
+    assert small_count == large_count
+
+
+def test_progress_reports_claimed_share_of_each_wishlist(make_event, login, statements):
+    event_id, user_ids = make_event(participants=3, items=2)
+
+    _, progress = fetch_progress(login(user_ids[0]), statements, event_id)
+
+    # two items at 10 and 11, the first of them claimed
+    assert progress[str(user_ids[1])] == {'purchased': '10.00', 'total': '21.00', 'percent': '47.62'}
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from conftest import BASE_URL
+
+from gifted import db
+from gifted.models import Item, Transaction
+
+
+def buy_everything(app, event_id, gifter_id):
+    with app.app_context():
+        for item in Item.query.filter(Item.event_id == event_id, Item.user_id != gifter_id).all():
+            assert Transaction.claim(item, gifter_id)
+        db.session.commit()
+
+
+def test_get_purchases_is_one_query(app, make_event, statements):
+    event_id, user_ids = make_event(participants=4, items=3, claimed=False)
+    buy_everything(app, event_id, user_ids[0])
+
+    with app.app_context(), statements() as recorded:
+        groups, total = Transaction.get_purchases(event_id, user_ids[0])
+
+    assert len(recorded) == 1
+    assert [group['giftee_id'] for group in groups] == user_ids[1:]
+    assert [group['subtotal'] for group in groups] == [Decimal('33.00')] * 3
+    assert total == Decimal('99.00')
+
+
+def test_purchases_page_query_count_does_not_grow_with_purchases(app, make_event, login, statements):
+    small, small_users = make_event(participants=2, items=1, claimed=False)
+    large, large_users = make_event(participants=20, items=5, claimed=False)
+    buy_everything(app, small, small_users[0])
+    buy_everything(app, large, large_users[0])
+
+    counts = []
+    for event_id, gifter_id in [(small, small_users[0]), (large, large_users[0])]:
+        client = login(gifter_id)
+        with statements() as recorded:
+            response = client.get(f'{BASE_URL}/events/{event_id}/purchases/{gifter_id}')
+        assert response.status_code == 200
+        counts.append(len(recorded))
+
+    assert counts[0] == counts[1]